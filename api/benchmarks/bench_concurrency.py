@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Concurrent-request load benchmark for the database-backed endpoints.
+
+Start the API against a local mongod first, e.g.:
+
+    MONGO_URI=mongodb://localhost:27017 uvicorn main:app --port 8000
+
+then run:
+
+    python benchmarks/bench_concurrency.py --concurrency 50 --requests 2000
+
+Run it once on a checkout with the old synchronous pymongo layer and once on
+the current tree to compare throughput and tail latency.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def seed(client, user_id):
+    await client.post("/users", json={"user_id": user_id, "topic_scores": [{"seed": 5.0}]})
+    response = await client.post("/documents", json={
+        "user_id": user_id,
+        "title": "Benchmark document",
+        "document_content": "Benchmark content. " * 500,
+        "topic_scores": [{"seed": 5.0}],
+        "questions": [],
+    })
+    response.raise_for_status()
+    return response.json()["data"]["_id"]
+
+
+async def run(base_url, concurrency, total_requests):
+    user_id = f"bench-{uuid.uuid4().hex[:8]}"
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        document_id = await seed(client, user_id)
+
+        # Mixed read/write workload hitting every collection
+        workload = [
+            ("GET /users/{id}", lambda: client.get(f"/users/{user_id}")),
+            ("GET /documents/{id}", lambda: client.get(f"/documents/{document_id}")),
+            ("GET /documents?user_id", lambda: client.get("/documents", params={"user_id": user_id})),
+            ("PUT /documents/{id}/scores", lambda: client.put(
+                f"/documents/{document_id}/scores", json={"topic_scores": [{"seed": 6.0}]})),
+        ]
+
+        latencies = {name: [] for name, _ in workload}
+        errors = 0
+        queue = asyncio.Queue()
+        for i in range(total_requests):
+            queue.put_nowait(workload[i % len(workload)])
+
+        async def worker():
+            nonlocal errors
+            while True:
+                try:
+                    name, call = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                start = time.perf_counter()
+                try:
+                    response = await call()
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies[name].append((time.perf_counter() - start) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        await client.delete(f"/documents/{document_id}")
+        await client.delete(f"/users/{user_id}")
+
+    print(f"\nConcurrency: {concurrency}  Requests: {total_requests}  Errors: {errors}")
+    print(f"Wall time: {elapsed:.2f}s  Throughput: {total_requests / elapsed:.1f} req/s\n")
+    print(f"{'endpoint':32} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for name, values in latencies.items():
+        print(f"{name:32} {percentile(values, 50):8.1f} {percentile(values, 95):8.1f} "
+              f"{percentile(values, 99):8.1f} {statistics.mean(values) if values else 0:8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.base_url, args.concurrency, args.requests))
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Lookup latency for users and documents with and without the indexes declared
+in db.INDEXES.
+
+Seeds a scratch database (dropped afterwards unless --keep) on the MongoDB at
+MONGO_URI, times UserDB.get_user and DocumentDB.list_documents before and
+after db.ensure_indexes(), and prints the documents examined per query.
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_indexes.py --documents 100000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import db  # noqa: E402
+from models.Document import DocumentDB  # noqa: E402
+from models.User import UserDB  # noqa: E402
+
+BATCH_SIZE = 10000
+
+
+async def seed(num_users: int, num_documents: int):
+    users = db.users_collection()
+    documents = db.documents_collection()
+    for start in range(0, num_users, BATCH_SIZE):
+        await users.insert_many([
+            {"user_id": f"user{i}", "topic_scores": [{"topic": 5.0}]}
+            for i in range(start, min(start + BATCH_SIZE, num_users))
+        ])
+    epoch = datetime(2024, 1, 1)
+    for start in range(0, num_documents, BATCH_SIZE):
+        batch = []
+        for i in range(start, min(start + BATCH_SIZE, num_documents)):
+            created = epoch + timedelta(seconds=i)
+            batch.append({
+                "user_id": f"user{i % num_users}",
+                "title": f"Document {i}",
+                "document_content": "lorem ipsum dolor sit amet " * 40,
+                "topic_scores": [{"topic": 5.0}],
+                "questions": [f"Question {j}?" for j in range(10)],
+                "created_at": created,
+                "updated_at": created,
+            })
+        await documents.insert_many(batch)
+
+
+async def timed(fn, samples: int):
+    durations = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        await fn()
+        durations.append((time.perf_counter() - started) * 1000)
+    durations.sort()
+    return statistics.median(durations), durations[int(len(durations) * 0.95) - 1]
+
+
+async def docs_examined(command):
+    """Documents examined by a find or aggregate command, from its explain plan"""
+    plan = await db.get_db().command("explain", command, verbosity="executionStats")
+    stats = plan.get("executionStats") or plan["stages"][0]["$cursor"]["executionStats"]
+    return stats["totalDocsExamined"]
+
+
+async def measure(label: str, num_users: int, samples: int):
+    def random_user():
+        return f"user{random.randrange(num_users)}"
+
+    get_user = await timed(lambda: UserDB.get_user(random_user()), samples)
+    list_docs = await timed(lambda: DocumentDB.list_documents(random_user(), limit=20), samples)
+    list_all = await timed(lambda: DocumentDB.list_documents(limit=20), samples)
+
+    user_id = random_user()
+    examined_user = await docs_examined({"find": "users", "filter": {"user_id": user_id}, "limit": 1})
+    examined_docs = await docs_examined({
+        "aggregate": "documents",
+        "pipeline": [{"$match": {"user_id": user_id}}, {"$sort": {"updated_at": -1, "_id": -1}}, {"$limit": 21}],
+        "cursor": {},
+    })
+
+    print(f"\n{label}")
+    print(f"  {'query':<32} {'p50 ms':>8} {'p95 ms':>8}")
+    print(f"  {'get_user':<32} {get_user[0]:>8.2f} {get_user[1]:>8.2f}   docs examined: {examined_user}")
+    print(f"  {'list_documents(user_id)':<32} {list_docs[0]:>8.2f} {list_docs[1]:>8.2f}   docs examined: {examined_docs}")
+    print(f"  {'list_documents()':<32} {list_all[0]:>8.2f} {list_all[1]:>8.2f}")
+
+
+async def main(args):
+    await db.connect()
+    db.db = db.client[args.database]
+    try:
+        await db.client.drop_database(args.database)
+        print(f"Seeding {args.users} users and {args.documents} documents into {args.database}...")
+        await seed(args.users, args.documents)
+
+        await measure("Without indexes", args.users, args.samples)
+        started = time.perf_counter()
+        await db.ensure_indexes()
+        print(f"\nCreated indexes in {time.perf_counter() - started:.1f}s")
+        await measure("With indexes", args.users, args.samples)
+        print()
+        print(await db.check_indexes())
+    finally:
+        if not args.keep:
+            await db.client.drop_database(args.database)
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--database", default="quiz_app_bench")
+    parser.add_argument("--keep", action="store_true", help="don't drop the scratch database afterwards")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+PDF parsing benchmark: the original in-process, string-concatenating
+extraction versus parsing.extract_text on synthetic 10/100/500-page PDFs.
+
+    python benchmarks/bench_parse.py --pages 10 100 500 --workers 4
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import PyPDF2  # noqa: E402
+
+import parsing  # noqa: E402
+
+
+def make_pdf(num_pages: int, lines_per_page: int = 45) -> bytes:
+    """Build a text-only PDF with num_pages pages of filler text"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for page in range(num_pages):
+        lines = [f"BT /F1 10 Tf 50 {780 - 16 * i} Td (Page {page + 1} line {i + 1}: "
+                 f"the quick brown fox jumps over the lazy dog {page * lines_per_page + i}) Tj ET"
+                 for i in range(lines_per_page)]
+        stream = "\n".join(lines).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref)
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % num_pages
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def parse_original(file_content: bytes) -> str:
+    """The previous /parse_file implementation"""
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+    text_content = ""
+    for idx, page in enumerate(pdf_reader.pages):
+        text_content += f"Page {idx + 1}\n"
+        text_content += page.extract_text() + "\n"
+    return text_content.strip()
+
+
+async def time_event_loop_stall(coro):
+    """Run coro while measuring the longest gap between event loop ticks"""
+    worst = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal worst
+        last = time.perf_counter()
+        while running:
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            worst = max(worst, now - last - 0.005)
+            last = now
+
+    tick_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    result = await coro
+    elapsed = time.perf_counter() - started
+    running = False
+    await tick_task
+    return result, elapsed, worst
+
+
+async def main(page_counts, workers):
+    parsing.PARSE_WORKERS = workers
+    parsing.start()
+    try:
+        print(f"{'pages':>6} {'original s':>11} {'parallel s':>11} {'speedup':>8} "
+              f"{'orig stall ms':>14} {'new stall ms':>13}")
+        for num_pages in page_counts:
+            content = make_pdf(num_pages)
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+                tmp.write(content)
+                path = tmp.name
+            try:
+                # Warm the pool so process start-up isn't measured
+                await parsing.extract_text(path, ".pdf")
+
+                async def original():
+                    return parse_original(content)
+
+                expected, original_s, original_stall = await time_event_loop_stall(original())
+                actual, parallel_s, parallel_stall = await time_event_loop_stall(parsing.extract_text(path, ".pdf"))
+                assert actual == expected, "parallel extraction output differs"
+                print(f"{num_pages:>6} {original_s:>11.2f} {parallel_s:>11.2f} {original_s / parallel_s:>7.1f}x "
+                      f"{original_stall * 1000:>14.0f} {parallel_stall * 1000:>13.0f}")
+            finally:
+                os.remove(path)
+    finally:
+        parsing.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    asyncio.run(main(args.pages, args.workers))
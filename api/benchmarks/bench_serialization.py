@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Serialization time for a page of documents: FastAPI's default path
+(jsonable_encoder, then JSONResponse) against MongoJSONResponse.
+
+Builds the records in memory as DocumentDB returns them (ObjectId _id,
+datetime timestamps), checks both paths produce the same JSON, and prints
+the median and p95 per response. No database needed.
+
+    python benchmarks/bench_serialization.py --documents 1000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from serialization import MongoJSONResponse  # noqa: E402
+
+
+def make_documents(count: int):
+    epoch = datetime(2024, 1, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "user_id": f"user{i % 100}",
+            "title": f"Document {i}",
+            "preview": "lorem ipsum dolor sit amet " * 7,
+            "content_length": 25000,
+            "question_count": 10,
+            "topic_scores": [{f"topic {j}": (i + j) % 10 + 0.5} for j in range(8)],
+            "questions": [f"Question {j} about document {i}?" for j in range(10)],
+            "created_at": epoch + timedelta(seconds=i),
+            "updated_at": epoch + timedelta(seconds=i, microseconds=123456),
+        }
+        for i in range(count)
+    ]
+
+
+def default_path(payload):
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def with_string_ids(payload):
+    """The payload as endpoints built it before, with every _id converted by hand"""
+    return {**payload, "data": [{**doc, "_id": str(doc["_id"])} for doc in payload["data"]]}
+
+
+def fast_path(payload):
+    return MongoJSONResponse(payload).body
+
+
+def timed(fn, payload, samples: int):
+    durations = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        fn(payload)
+        durations.append((time.perf_counter() - started) * 1000)
+    durations.sort()
+    return statistics.median(durations), durations[int(len(durations) * 0.95) - 1]
+
+
+def main(args):
+    payload = {"success": True, "data": make_documents(args.documents), "next_cursor": None}
+    legacy_payload = with_string_ids(payload)
+    if json.loads(default_path(legacy_payload)) != json.loads(fast_path(payload)):
+        sys.exit("MongoJSONResponse output differs from the default encoder")
+
+    before = timed(default_path, legacy_payload, args.samples)
+    after = timed(fast_path, payload, args.samples)
+    print(f"{args.documents} documents, {len(fast_path(payload)) / 1024:.0f} KB of JSON, {args.samples} samples")
+    print(f"  {'path':<36} {'p50 ms':>8} {'p95 ms':>8}")
+    print(f"  {'jsonable_encoder + JSONResponse':<36} {before[0]:>8.2f} {before[1]:>8.2f}")
+    print(f"  {'MongoJSONResponse (orjson)':<36} {after[0]:>8.2f} {after[1]:>8.2f}")
+    print(f"  speedup: {before[0] / after[0]:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--samples", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Minimal OpenAI-compatible chat completions server for local testing.
+
+    python benchmarks/fake_openai.py --port 9000 --latency 3 --error-rate 0.1
+
+then start the API with:
+
+    OPENAI_BASE_URL=http://localhost:9000/v1 OPENAI_API_KEY=fake uvicorn main:app
+
+Responses are canned but shaped like the real ones for each /ai/* prompt, so
+the API's parsing code paths are exercised. Latency and the share of 429/500
+responses are configurable to exercise concurrency limits and retries.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI()
+app.state.latency = 0.0
+app.state.jitter = 0.0
+app.state.error_rate = 0.0
+app.state.in_flight = 0
+app.state.max_in_flight = 0
+
+_counter = itertools.count(1)
+_SYLLABLES = ["ba", "ce", "di", "fo", "gu", "ka", "le", "mi", "no", "pu", "ra", "se", "ti", "vo", "zu"]
+
+
+def _question(key: str) -> str:
+    """A synthetic question whose words differ per key, so near-duplicate checks pass it"""
+    rng = random.Random(key)
+    words = ["".join(rng.choice(_SYLLABLES) for _ in range(3)) for _ in range(4)]
+    return f"Synthetic question about {' '.join(words)}?"
+
+
+def _reply_for(prompt: str) -> str:
+    n = next(_counter)
+    if "topic extraction" in prompt:
+        return json.dumps({"topics": ["Topic A", "Topic B", "Topic C"]})
+    if "document naming" in prompt:
+        return f"Synthetic Document {n}"
+    batch = re.search(r"Generate EXACTLY (\d+) questions", prompt)
+    if batch:
+        return json.dumps({"questions": [
+            {
+                "question": _question(f"{n}-{i}"),
+                "options": ["A", "B", "C", "D"],
+                "answer": "A",
+            }
+            for i in range(int(batch.group(1)))
+        ]})
+    return json.dumps({
+        "question": _question(str(n)),
+        "options": ["A", "B", "C", "D"],
+        "answer": "A",
+    })
+
+
+@app.get("/stats")
+async def stats():
+    return {"in_flight": app.state.in_flight, "max_in_flight": app.state.max_in_flight}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    app.state.in_flight += 1
+    app.state.max_in_flight = max(app.state.max_in_flight, app.state.in_flight)
+    try:
+        await asyncio.sleep(max(0.0, app.state.latency + random.uniform(-1, 1) * app.state.jitter))
+        if random.random() < app.state.error_rate:
+            status = random.choice([429, 500, 503])
+            return JSONResponse(
+                status_code=status,
+                content={"error": {"message": "synthetic failure", "type": "server_error"}},
+                headers={"retry-after": "0.1"} if status == 429 else None,
+            )
+        prompt = body["messages"][-1]["content"]
+        content = _reply_for(prompt)
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        return {
+            "id": f"chatcmpl-fake-{next(_counter)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+    finally:
+        app.state.in_flight -= 1
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with 429/5xx")
+    args = parser.parse_args()
+    app.state.latency = args.latency
+    app.state.jitter = args.jitter
+    app.state.error_rate = args.error_rate
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
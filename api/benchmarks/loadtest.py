@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Reproducible load test: the API in-process against a local mongod and an
+in-process fake OpenAI server (benchmarks/fake_openai.py), driven by
+concurrent simulated users.
+
+Each session runs the app's real flow:
+1. Create a user.
+2. Upload a file (/parse_file).
+3. Extract topics and name the document.
+4. Create the document.
+5. Stream N quiz questions.
+6. Submit the results.
+7. Reload the dashboard (user, document list, document).
+
+With --ingest, steps 2-4 are a single POST /ingest instead.
+
+Latency percentiles and throughput per endpoint are printed and saved as JSON
+together with the commit and settings, so runs can be compared across commits:
+
+    python benchmarks/loadtest.py --sessions 200 --concurrency 20 --output base.json
+    git checkout my-branch
+    python benchmarks/loadtest.py --sessions 200 --concurrency 20 --compare base.json
+
+Without --mongo-uri a throwaway mongod (from PATH, or --mongod) is started on
+a free port with a temporary data directory. mongomock can't stand in for it:
+document content lives in GridFS and score updates use aggregation pipelines.
+Against --mongo-uri the run uses its own database, dropped afterwards.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def start_mongod(binary: str):
+    """Start a throwaway mongod; returns its process, URI and data directory"""
+    if shutil.which(binary) is None:
+        sys.exit(f"{binary} not found; install MongoDB or pass --mongo-uri")
+    port = free_port()
+    dbpath = tempfile.mkdtemp(prefix="loadtest-mongod-")
+    process = subprocess.Popen(
+        [binary, "--dbpath", dbpath, "--port", str(port), "--bind_ip", "127.0.0.1", "--quiet"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    from pymongo import MongoClient
+    client = MongoClient(f"mongodb://127.0.0.1:{port}", serverSelectionTimeoutMS=500)
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            client.admin.command("ping")
+            break
+        except Exception:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                sys.exit("mongod failed to start")
+            time.sleep(0.2)
+    client.close()
+    return process, f"mongodb://127.0.0.1:{port}", dbpath
+
+
+async def start_fake_openai(args):
+    import uvicorn
+    import fake_openai
+
+    fake_openai.app.state.latency = args.llm_latency
+    fake_openai.app.state.jitter = args.llm_jitter
+    fake_openai.app.state.error_rate = args.llm_error_rate
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(fake_openai.app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server, task, f"http://127.0.0.1:{port}/v1"
+
+
+def make_upload(args):
+    """Function returning each session's upload as (filename, content, content type).
+
+    Text uploads differ per session unless --repeat-uploads, so the parse and
+    LLM caches don't answer every session after the first; a PDF upload is the
+    same file every time.
+    """
+    if args.pdf_pages:
+        from bench_parse import make_pdf
+        pdf = make_pdf(args.pdf_pages)
+        return lambda: ("notes.pdf", pdf, "application/pdf")
+    text = "\n\n".join(
+        f"Section {i}. Photosynthesis converts light energy into chemical energy in chloroplasts. "
+        f"Cellular respiration releases that energy as ATP in the mitochondria. "
+        f"Enzymes catalyse each step and are sensitive to temperature and pH ({i})."
+        for i in range(args.text_paragraphs)
+    )
+    if args.repeat_uploads:
+        return lambda: ("notes.txt", text.encode("utf-8"), "text/plain")
+    return lambda: ("notes.txt", f"Notes {uuid.uuid4().hex}\n\n{text}".encode("utf-8"), "text/plain")
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.flows = {}
+
+    async def call(self, name, request):
+        """Time one request; returns the response, or None if it failed"""
+        started = time.perf_counter()
+        try:
+            response = await request
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        self.latencies.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return None
+        return response
+
+    def record(self, name, seconds):
+        """Time a step of the session that spans several requests"""
+        self.flows.setdefault(name, []).append(seconds * 1000)
+
+
+def parse_sse(text: str):
+    """Question payloads from a /ai/generate-quiz/stream body"""
+    questions = []
+    for block in text.split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if lines.get("event") == "question":
+            questions.append(json.loads(lines["data"]))
+    return questions
+
+
+async def session(client, recorder: Recorder, upload, args):
+    user_id = f"load-{uuid.uuid4().hex[:12]}"
+    if await recorder.call("POST /users", client.post("/users", json={"user_id": user_id})) is None:
+        return
+
+    filename, content, content_type = upload()
+    started = time.perf_counter()
+    if args.ingest:
+        response = await recorder.call("POST /ingest", client.post(
+            "/ingest", files={"file": (filename, io.BytesIO(content), content_type)}, data={"user_id": user_id}))
+        if response is None:
+            return
+        topics = response.json()["data"]["topics"] or ["general"]
+        document_id = response.json()["data"]["document"]["_id"]
+    else:
+        response = await recorder.call("POST /parse_file", client.post(
+            "/parse_file", files={"file": (filename, io.BytesIO(content), content_type)}))
+        if response is None or not response.json().get("success"):
+            return
+        text_content = response.json()["data"]["text_content"]
+
+        # The client asks for topics and a title before the user confirms them
+        response = await recorder.call("POST /ai/extract-topics", client.post(
+            "/ai/extract-topics", json={"text_content": text_content, "current_topics": []}))
+        topics = response.json()["data"]["topics"] if response is not None else ["general"]
+        response = await recorder.call("POST /ai/generate-document-name", client.post(
+            "/ai/generate-document-name", json={"text_content": text_content}))
+        title = response.json()["data"]["title"] if response is not None else "Load test notes"
+
+        response = await recorder.call("POST /documents", client.post("/documents", json={
+            "user_id": user_id,
+            "title": title,
+            "document_content": text_content,
+            "topic_scores": [{topic: 0.0} for topic in topics],
+            "questions": [],
+        }))
+        if response is None:
+            return
+        document_id = response.json()["data"]["_id"]
+    recorder.record("upload to document", time.perf_counter() - started)
+
+    response = await recorder.call("POST /ai/generate-quiz/stream", client.post(
+        "/ai/generate-quiz/stream",
+        json={"document_id": document_id, "topics": topics, "num_questions": args.questions},
+    ))
+    questions = parse_sse(response.text) if response is not None else []
+
+    await recorder.call("POST /documents/{id}/quiz-results", client.post(
+        f"/documents/{document_id}/quiz-results",
+        json={"user_id": user_id, "results": [
+            # Questions stream in completion order, so each carries its own topic
+            {"question": q["question"], "topic": q.get("topic", topics[0]), "correct": random.random() < 0.7}
+            for q in questions
+        ]},
+    ))
+
+    # Dashboard reload
+    await recorder.call("GET /users/{id}", client.get(f"/users/{user_id}"))
+    await recorder.call("GET /documents?user_id", client.get("/documents", params={"user_id": user_id}))
+    await recorder.call("GET /documents/{id}", client.get(f"/documents/{document_id}"))
+
+
+def summarize(recorder: Recorder, elapsed: float):
+    endpoints = {}
+    for name, values in sorted(recorder.latencies.items()):
+        endpoints[name] = {
+            "requests": len(values),
+            "errors": recorder.errors.get(name, 0),
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "mean_ms": round(statistics.mean(values), 2),
+        }
+    total = sum(len(values) for values in recorder.latencies.values())
+    return {
+        "wall_time_s": round(elapsed, 2),
+        "requests": total,
+        "errors": sum(recorder.errors.values()),
+        "throughput_rps": round(total / elapsed, 2),
+        "endpoints": endpoints,
+        "flows": {
+            name: {"p50_ms": round(percentile(values, 50), 2), "p95_ms": round(percentile(values, 95), 2)}
+            for name, values in sorted(recorder.flows.items())
+        },
+    }
+
+
+def report(result, baseline=None):
+    summary = result["summary"]
+    print(f"\n{result['settings']['sessions']} sessions at concurrency {result['settings']['concurrency']} "
+          f"(commit {result['commit']})")
+    print(f"Wall time: {summary['wall_time_s']}s  Requests: {summary['requests']}  "
+          f"Errors: {summary['errors']}  Throughput: {summary['throughput_rps']} req/s\n")
+    print(f"{'endpoint':34} {'reqs':>6} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in summary["endpoints"].items():
+        line = (f"{name:34} {stats['requests']:>6} {stats['errors']:>5} "
+                f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+        previous = (baseline or {}).get("summary", {}).get("endpoints", {}).get(name)
+        if previous and previous["p95_ms"]:
+            line += f"   p95 {(stats['p95_ms'] / previous['p95_ms'] - 1) * 100:+.0f}% vs {baseline['commit']}"
+        print(line)
+    for name, stats in summary.get("flows", {}).items():
+        line = f"{name:34} {'':>6} {'':>5} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f}"
+        previous = (baseline or {}).get("summary", {}).get("flows", {}).get(name)
+        if previous and previous["p95_ms"]:
+            line += f"   {'':>9}   p95 {(stats['p95_ms'] / previous['p95_ms'] - 1) * 100:+.0f}% vs {baseline['commit']}"
+        print(line)
+
+
+async def main(args):
+    mongod = None
+    if args.mongo_uri:
+        mongo_uri = args.mongo_uri
+    else:
+        mongod, mongo_uri, dbpath = start_mongod(args.mongod)
+    fake_server, fake_task, openai_url = await start_fake_openai(args)
+
+    # Read by db and llm at import time
+    os.environ["MONGO_URI"] = mongo_uri
+    os.environ["OPENAI_BASE_URL"] = openai_url
+    os.environ["OPENAI_API_KEY"] = "fake"
+    import db
+    import main as api
+
+    random.seed(args.seed)
+    await db.connect()
+    db.db = db.client[args.database]
+    await db.client.drop_database(args.database)
+    try:
+        async with api.lifespan(api.app):
+            limits = httpx.Limits(max_connections=args.concurrency)
+            transport = httpx.ASGITransport(app=api.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest",
+                                         limits=limits, timeout=120) as client:
+                recorder = Recorder()
+                upload = make_upload(args)
+                queue = asyncio.Queue()
+                for _ in range(args.sessions):
+                    queue.put_nowait(None)
+
+                async def virtual_user():
+                    while not queue.empty():
+                        queue.get_nowait()
+                        await session(client, recorder, upload, args)
+
+                started = time.perf_counter()
+                await asyncio.gather(*(virtual_user() for _ in range(args.concurrency)))
+                elapsed = time.perf_counter() - started
+    finally:
+        if db.client is None:
+            await db.connect()
+        if not args.keep:
+            await db.client.drop_database(args.database)
+        db.close()
+        fake_server.should_exit = True
+        await fake_task
+        if mongod is not None:
+            mongod.terminate()
+            mongod.wait()
+            shutil.rmtree(dbpath, ignore_errors=True)
+
+    settings = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    result = {
+        "commit": git_commit(),
+        "started_at": datetime.utcnow().isoformat(),
+        "settings": settings,
+        "summary": summarize(recorder, elapsed),
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(result, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=100, help="simulated user sessions in total")
+    parser.add_argument("--concurrency", type=int, default=10, help="sessions running at once")
+    parser.add_argument("--questions", type=int, default=10, help="quiz questions per session")
+    parser.add_argument("--pdf-pages", type=int, default=0, help="upload a PDF of this many pages instead of text")
+    parser.add_argument("--text-paragraphs", type=int, default=40, help="paragraphs in the uploaded text file")
+    parser.add_argument("--repeat-uploads", action="store_true",
+                        help="upload the same text every session, so later sessions hit the caches")
+    parser.add_argument("--ingest", action="store_true",
+                        help="upload with POST /ingest instead of parse, extract topics, name and create")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per fake completion")
+    parser.add_argument("--llm-jitter", type=float, default=0.1, help="+/- seconds of random completion latency")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="share of completions failing with 429/5xx")
+    parser.add_argument("--mongo-uri", help="use this MongoDB instead of starting a mongod")
+    parser.add_argument("--mongod", default="mongod", help="mongod binary to start")
+    parser.add_argument("--database", default="quiz_app_loadtest")
+    parser.add_argument("--keep", action="store_true", help="don't drop the load test database afterwards")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for answers")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare p95 latency against")
+    asyncio.run(main(parser.parse_args()))
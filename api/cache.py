@@ -0,0 +1,297 @@
+import hashlib
+import json
+import logging
+import os
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, List, Optional
+
+from gridfs.errors import FileExists, NoFile
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# Entries kept in the per-worker LRU tier
+LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', '1024'))
+# Entry lifetime for both tiers
+LLM_CACHE_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+# Share cached responses across workers and restarts via MongoDB
+LLM_CACHE_PERSIST = os.getenv('LLM_CACHE_PERSIST', 'false').lower() in ('1', 'true', 'yes')
+
+# Request header that skips cache lookups (the fresh result is still stored)
+BYPASS_HEADER = "X-Cache-Bypass"
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different uploads share a cache entry"""
+    return " ".join(text.split())
+
+
+def make_key(kind: str, model: str, **inputs) -> str:
+    """Content-addressed key for an LLM call: a hash of the endpoint, model and prompt inputs"""
+    payload = json.dumps({"kind": kind, "model": model, "inputs": inputs}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Two-tier cache for LLM results: an in-process LRU and an optional MongoDB collection with a TTL index"""
+
+    def __init__(self, max_size: int = LLM_CACHE_SIZE, ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+                 persist: bool = LLM_CACHE_PERSIST):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.stats = {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "bypasses": 0, "evictions": 0}
+
+    async def setup(self):
+        """Create the TTL index backing the persistent tier"""
+        if not self.persist:
+            return
+        await db.llm_cache_collection().create_index("created_at", expireAfterSeconds=self.ttl_seconds)
+
+    def _remember(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return value
+            del self._entries[key]
+
+        if self.persist:
+            try:
+                doc = await db.llm_cache_collection().find_one({"_id": key})
+            except Exception as e:
+                logger.warning(f"LLM cache lookup failed: {e}")
+                doc = None
+            if doc is not None:
+                self._remember(key, doc["value"])
+                self.stats["persistent_hits"] += 1
+                return doc["value"]
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any, kind: Optional[str] = None):
+        self._remember(key, value)
+        if self.persist:
+            try:
+                await db.llm_cache_collection().replace_one(
+                    {"_id": key},
+                    {"_id": key, "kind": kind, "value": value, "created_at": datetime.utcnow()},
+                    upsert=True,
+                )
+            except Exception as e:
+                logger.warning(f"LLM cache write failed: {e}")
+
+    def record_bypass(self):
+        self.stats["bypasses"] += 1
+
+    def get_stats(self):
+        hits = self.stats["memory_hits"] + self.stats["persistent_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hits": hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "persistent": self.persist,
+        }
+
+
+llm_cache = LLMCache()
+
+
+# UTF-8 bytes of extracted text kept in the per-worker LRU
+PARSE_CACHE_MEMORY_BYTES = int(os.getenv('PARSE_CACHE_MEMORY_BYTES', str(64 * 1024 * 1024)))
+# Store extracted text in GridFS, shared across workers and restarts
+PARSE_CACHE_PERSIST = os.getenv('PARSE_CACHE_PERSIST', 'false').lower() in ('1', 'true', 'yes')
+# Compressed bytes kept in GridFS before least-recently-used entries are evicted
+PARSE_CACHE_PERSIST_BYTES = int(os.getenv('PARSE_CACHE_PERSIST_BYTES', str(1024 * 1024 * 1024)))
+# Seconds between recounts of the GridFS tier's size, which other workers write to as well
+PARSE_CACHE_PERSIST_RECOUNT_SECONDS = int(os.getenv('PARSE_CACHE_PERSIST_RECOUNT_SECONDS', '300'))
+
+
+class ParsedTextCache:
+    """Cache of extracted upload text keyed by the file's content hash.
+
+    Tiers are an in-process LRU bounded by the UTF-8 size of its text and an
+    optional zlib-compressed GridFS bucket bounded by total stored bytes. Both
+    evict least recently used entries first.
+    """
+
+    def __init__(self, max_bytes: int = PARSE_CACHE_MEMORY_BYTES, persist: bool = PARSE_CACHE_PERSIST,
+                 persist_max_bytes: int = PARSE_CACHE_PERSIST_BYTES):
+        self.max_bytes = max_bytes
+        self.persist = persist
+        self.persist_max_bytes = persist_max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._size = 0
+        self._persisted_size: Optional[int] = None
+        self._persisted_counted_at = 0.0
+        self.stats = {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "evictions": 0, "persistent_evictions": 0}
+
+    @staticmethod
+    def make_key(digest: str, kind: str) -> str:
+        return f"{kind.lstrip('.')}:{digest}"
+
+    async def setup(self):
+        if not self.persist:
+            return
+        await db.parsed_text_files_collection().create_index("metadata.last_used")
+
+    def _remember(self, key: str, pieces: List[str]):
+        size = sum(len(piece.encode("utf-8")) for piece in pieces)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._size -= self._entries.pop(key)[0]
+        self._entries[key] = (size, pieces)
+        self._size += size
+        while self._size > self.max_bytes:
+            _, (evicted_size, _) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+            self.stats["evictions"] += 1
+
+    async def get(self, key: str) -> Optional[List[str]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return entry[1]
+
+        if self.persist:
+            try:
+                stream = await db.parsed_text_bucket().open_download_stream(key)
+                pieces = json.loads(zlib.decompress(await stream.read()).decode("utf-8"))
+                await db.parsed_text_files_collection().update_one(
+                    {"_id": key}, {"$set": {"metadata.last_used": datetime.utcnow()}}
+                )
+                self._remember(key, pieces)
+                self.stats["persistent_hits"] += 1
+                return pieces
+            except NoFile:
+                pass
+            except Exception as e:
+                logger.warning(f"Parsed text cache lookup failed: {e}")
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, pieces: List[str], filename: Optional[str] = None):
+        self._remember(key, pieces)
+        if not self.persist:
+            return
+        try:
+            data = zlib.compress(json.dumps(pieces, ensure_ascii=False).encode("utf-8"))
+            await db.parsed_text_bucket().upload_from_stream_with_id(
+                key, filename or key, data, metadata={"last_used": datetime.utcnow()}
+            )
+            if self._persisted_size is not None:
+                self._persisted_size += len(data)
+            await self._evict_persistent()
+        except FileExists:
+            pass
+        except Exception as e:
+            logger.warning(f"Parsed text cache write failed: {e}")
+
+    async def _persisted_bytes(self) -> int:
+        """Bytes stored in GridFS: a running total, recounted now and then to take in other workers' writes"""
+        if (self._persisted_size is None
+                or time.monotonic() - self._persisted_counted_at > PARSE_CACHE_PERSIST_RECOUNT_SECONDS):
+            totals = await db.parsed_text_files_collection().aggregate(
+                [{"$group": {"_id": None, "bytes": {"$sum": "$length"}}}]
+            ).to_list(length=1)
+            self._persisted_size = totals[0]["bytes"] if totals else 0
+            self._persisted_counted_at = time.monotonic()
+        return self._persisted_size
+
+    async def _evict_persistent(self):
+        if await self._persisted_bytes() <= self.persist_max_bytes:
+            return
+        cursor = db.parsed_text_files_collection().find({}, {"length": 1}).sort("metadata.last_used", 1)
+        async for entry in cursor:
+            if self._persisted_size <= self.persist_max_bytes:
+                break
+            try:
+                await db.parsed_text_bucket().delete(entry["_id"])
+                self.stats["persistent_evictions"] += 1
+            except NoFile:
+                # Evicted by another worker
+                pass
+            self._persisted_size -= entry["length"]
+
+    def get_stats(self):
+        hits = self.stats["memory_hits"] + self.stats["persistent_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hits": hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "persistent": self.persist,
+        }
+
+
+parsed_cache = ParsedTextCache()
+
+
+# UTF-8 bytes of document text kept in memory for AI requests that reference a document by ID
+DOCUMENT_TEXT_CACHE_BYTES = int(os.getenv('DOCUMENT_TEXT_CACHE_BYTES', str(64 * 1024 * 1024)))
+
+
+class DocumentTextCache:
+    """Per-worker LRU of stored document text, keyed by document ID and bounded by its total UTF-8 size"""
+
+    def __init__(self, max_bytes: int = DOCUMENT_TEXT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._size = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, document_id: str) -> Optional[str]:
+        entry = self._entries.get(document_id)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(document_id)
+        self.stats["hits"] += 1
+        return entry[1]
+
+    def set(self, document_id: str, text: str):
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        self.discard(document_id)
+        self._entries[document_id] = (size, text)
+        self._size += size
+        while self._size > self.max_bytes:
+            _, (evicted_size, _) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+            self.stats["evictions"] += 1
+
+    def discard(self, document_id: str):
+        entry = self._entries.pop(document_id, None)
+        if entry is not None:
+            self._size -= entry[0]
+
+    def get_stats(self):
+        return {**self.stats, "entries": len(self._entries), "bytes": self._size, "max_bytes": self.max_bytes}
+
+
+document_text_cache = DocumentTextCache()
@@ -1,28 +1,179 @@
-import pymongo
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
 import logging
 import os
 
+import metrics
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# MongoDB connection
-try:
-    # Use environment variable for MongoDB URI, fallback to localhost for development
-    mongodb_uri = os.getenv('MONGO_URI', 'localhost:27017')
-    if mongodb_uri.startswith('mongodb://'):
-        client = pymongo.MongoClient(mongodb_uri)
-    else:
-        # Handle the case where MONGODB_URI is just the host:port
-        client = pymongo.MongoClient(mongodb_uri)
-    
-    db = client.quiz_app
-    
-    # Collections
-    users_collection = db.users
-    documents_collection = db.documents
-    
-    logger.info("Connected to MongoDB successfully")
-except Exception as e:
-    logger.error(f"Failed to connect to MongoDB: {e}")
-    raise 
\ No newline at end of file
+# Use environment variable for MongoDB URI, fallback to localhost for development
+mongodb_uri = os.getenv('MONGO_URI', 'localhost:27017')
+
+# Connection pool tuning (see pymongo MongoClient options)
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '0'))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', '60000'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '10000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+# Create declared indexes at startup (disable to manage them out of band on large collections)
+MONGO_ENSURE_INDEXES = os.getenv('MONGO_ENSURE_INDEXES', 'true').lower() in ('1', 'true', 'yes')
+
+# Indexes the app's queries rely on, by collection
+INDEXES = {
+    "users": [
+        # get_user/create_user lookups; also makes create_user race-free
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "documents": [
+        # GET /documents?user_id=..., newest first, and its keyset cursor
+        IndexModel([("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)],
+                   name="user_id_updated_at"),
+        # GET /documents across all users
+        IndexModel([("updated_at", DESCENDING), ("_id", DESCENDING)], name="updated_at"),
+    ],
+}
+
+# Shared client, created once at app startup by connect()
+client = None
+db = None
+_transactions_supported = None
+
+
+async def connect():
+    """Create the shared Motor client and connection pool"""
+    global client, db
+    if client is not None:
+        return
+    try:
+        client = AsyncIOMotorClient(
+            mongodb_uri,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            event_listeners=[metrics.MongoCommandListener()],
+        )
+        db = client.quiz_app
+        logger.info(f"Connected to MongoDB successfully (maxPoolSize={MONGO_MAX_POOL_SIZE})")
+    except Exception as e:
+        logger.error(f"Failed to connect to MongoDB: {e}")
+        raise
+
+
+def close():
+    """Close the shared Motor client"""
+    global client, db, _transactions_supported
+    if client is not None:
+        client.close()
+        logger.info("Closed MongoDB connection")
+    client = None
+    db = None
+    _transactions_supported = None
+
+
+async def supports_transactions() -> bool:
+    """Whether the deployment supports multi-document transactions (replica sets and sharded clusters)"""
+    global _transactions_supported
+    if _transactions_supported is None:
+        try:
+            hello = await client.admin.command("hello")
+            _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+        except Exception as e:
+            # Not cached, so the next call checks again
+            logger.warning(f"Could not determine MongoDB topology: {e}")
+            return False
+        logger.info(f"MongoDB transactions {'enabled' if _transactions_supported else 'unavailable'}")
+    return _transactions_supported
+
+
+async def ensure_indexes():
+    """Create the declared indexes; a no-op for indexes that already exist"""
+    for collection, indexes in INDEXES.items():
+        try:
+            names = await get_db()[collection].create_indexes(indexes)
+            logger.info(f"Ensured indexes on {collection}: {', '.join(names)}")
+        except OperationFailure as e:
+            # e.g. duplicate user_ids left over from before the unique index
+            logger.error(f"Failed to create indexes on {collection}: {e}")
+
+
+async def check_indexes():
+    """Report declared indexes that are missing and existing indexes that have never been used.
+
+    Usage counts come from $indexStats and reset when mongod restarts, so
+    "unused" means unused since then.
+    """
+    report = {}
+    for collection, indexes in INDEXES.items():
+        existing = await get_db()[collection].index_information()
+        declared = [index.document["name"] for index in indexes]
+        missing = [name for name in declared if name not in existing]
+        try:
+            stats = await get_db()[collection].aggregate([{"$indexStats": {}}]).to_list(length=None)
+            unused = [s["name"] for s in stats if s["name"] != "_id_" and s["accesses"]["ops"] == 0]
+        except Exception as e:
+            # $indexStats needs the clusterMonitor role on some deployments
+            logger.warning(f"Could not read index usage for {collection}: {e}")
+            unused = []
+        if missing:
+            logger.warning(f"Missing indexes on {collection}: {', '.join(missing)}")
+        if unused:
+            logger.warning(f"Unused indexes on {collection}: {', '.join(unused)}")
+        report[collection] = {"missing": missing, "unused": unused}
+    return report
+
+
+def get_db():
+    if db is None:
+        raise RuntimeError("MongoDB client is not initialized, call db.connect() at startup")
+    return db
+
+
+# Collections
+def users_collection():
+    return get_db().users
+
+
+def documents_collection():
+    return get_db().documents
+
+
+def llm_cache_collection():
+    return get_db().llm_cache
+
+
+def question_pool_collection():
+    return get_db().question_pool
+
+
+def parsed_text_bucket():
+    return AsyncIOMotorGridFSBucket(get_db(), bucket_name="parsed_text")
+
+
+def document_content_bucket():
+    return AsyncIOMotorGridFSBucket(get_db(), bucket_name="document_content")
+
+
+def parsed_text_files_collection():
+    return get_db()["parsed_text.files"]
+
+
+def document_chunks_collection():
+    return get_db().document_chunks
+
+
+def question_history_collection():
+    return get_db().question_history
+
+
+def ingest_jobs_collection():
+    return get_db().ingest_jobs
+
+
+def ingest_uploads_bucket():
+    return AsyncIOMotorGridFSBucket(get_db(), bucket_name="ingest_uploads")
@@ -0,0 +1,88 @@
+"""Document bodies, stored apart from the document record.
+
+Text is zlib-compressed into the document_content GridFS bucket under the
+document's _id, so reads and updates of a document's metadata never carry its
+content and large documents stay clear of the 16 MB BSON limit. Records
+created before this keep document_content inline until migrate() moves it.
+"""
+
+import asyncio
+import logging
+import os
+import zlib
+from typing import Optional
+
+from bson import ObjectId
+from gridfs.errors import FileExists, NoFile
+
+import db
+import migrations
+
+logger = logging.getLogger(__name__)
+
+# zlib level used for stored document text
+CONTENT_COMPRESSION_LEVEL = int(os.getenv('CONTENT_COMPRESSION_LEVEL', '6'))
+# Move inline document_content into GridFS in the background at startup
+DOCUMENT_CONTENT_MIGRATE = os.getenv('DOCUMENT_CONTENT_MIGRATE', 'true').lower() in ('1', 'true', 'yes')
+
+
+def _compress(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), CONTENT_COMPRESSION_LEVEL)
+
+
+def _decompress(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+
+async def save(document_id: ObjectId, text: str):
+    data = await asyncio.to_thread(_compress, text)
+    await db.document_content_bucket().upload_from_stream_with_id(
+        document_id, str(document_id), data, metadata={"encoding": "zlib", "length": len(text)}
+    )
+
+
+async def load(document_id: ObjectId) -> Optional[str]:
+    """The document's stored text, or None if it has none in GridFS"""
+    try:
+        stream = await db.document_content_bucket().open_download_stream(document_id)
+    except NoFile:
+        return None
+    return await asyncio.to_thread(_decompress, await stream.read())
+
+
+async def delete(document_id: ObjectId):
+    try:
+        await db.document_content_bucket().delete(document_id)
+    except NoFile:
+        pass
+
+
+async def migrate(preview_chars: int) -> int:
+    """Move inline document_content into GridFS; safe to run while serving traffic"""
+    migrated = 0
+    documents = db.documents_collection()
+    async for record in documents.find({"document_content": {"$exists": True}}, {"document_content": 1}):
+        text = record["document_content"] or ""
+        try:
+            await save(record["_id"], text)
+        except FileExists:
+            # Left behind by an interrupted run
+            pass
+        result = await documents.update_one(
+            {"_id": record["_id"], "document_content": {"$exists": True}},
+            {
+                "$unset": {"document_content": ""},
+                "$set": {"preview": text[:preview_chars], "content_length": len(text)},
+            },
+        )
+        migrated += result.modified_count
+    return migrated
+
+
+async def _migrate_all(preview_chars: int):
+    migrated = await migrate(preview_chars)
+    if migrated:
+        logger.info(f"Moved the content of {migrated} documents to GridFS")
+
+
+migration = migrations.BackgroundMigration("Document content", _migrate_all, enabled=DOCUMENT_CONTENT_MIGRATE)
@@ -0,0 +1,144 @@
+"""The stages of ingesting an upload: text extraction, topic extraction and naming.
+
+Shared by the /parse_file and /ai/* endpoints and the ingestion job workers
+(see ingest_jobs), so every path uses the same prompts and caches.
+"""
+
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import UploadFile
+
+import llm
+import parsing
+import prompts
+from cache import llm_cache, parsed_cache, make_key, normalize_text
+from prompts import Flexible
+
+logger = logging.getLogger(__name__)
+
+# Characters of a document that reach the naming prompt, before its token budget applies
+NAME_PROMPT_CHARS = 1000
+# Token cap on the list of a user's existing topics in the topic extraction prompt
+CURRENT_TOPICS_TOKENS = 300
+
+
+async def parse_upload(path: str, kind: str, digest: str, filename: Optional[str] = None) -> str:
+    """Text content of a spooled upload; repeat uploads of the same file skip extraction"""
+    cache_key = parsed_cache.make_key(digest, kind)
+    pieces = await parsed_cache.get(cache_key)
+    if pieces is None:
+        pieces = await parsing.extract_pieces(path, kind)
+        await parsed_cache.set(cache_key, pieces, filename=filename)
+    return parsing.format_text(pieces, kind)
+
+
+@asynccontextmanager
+async def spooled(file: UploadFile, kind: str) -> AsyncIterator[Tuple[str, str]]:
+    """The upload spooled to a temporary file, as (path, digest); the file is removed on exit"""
+    path, digest = await parsing.spool_upload(file, suffix=kind)
+    try:
+        yield path, digest
+    finally:
+        os.remove(path)
+
+
+async def parse_uploaded(file: UploadFile, kind: str) -> str:
+    """Text content of a request's upload"""
+    async with spooled(file, kind) as (path, digest):
+        return await parse_upload(path, kind, digest, filename=file.filename)
+
+
+async def _cached(cache_key: str, bypass: bool):
+    """Cached result and X-Cache status for an LLM lookup"""
+    if bypass:
+        llm_cache.record_bypass()
+        return None, "BYPASS"
+    value = await llm_cache.get(cache_key)
+    return value, "MISS" if value is None else "HIT"
+
+
+async def extract_topics(text_content: str, current_topics: Optional[List[str]] = None,
+                         bypass: bool = False) -> Tuple[List[str], str]:
+    """1-4 quiz topics for text_content, keeping relevant current_topics; returns (topics, cache status)"""
+    cache_key = make_key(
+        "extract-topics",
+        llm.client.model,
+        text_content=normalize_text(text_content),
+        current_topics=sorted(set(current_topics or [])),
+    )
+    topics, status = await _cached(cache_key, bypass)
+    if topics is not None:
+        return topics, status
+
+    template = """
+        You are a topic extraction assistant. Please analyze the following text and extract 1-4 key topics that would be suitable for creating quiz questions.
+        Only extract topics that are relevant to the text content.
+
+        Output format:
+        {{
+            "topics": ["Topic 1", "Topic 2", "Topic 3", "Topic 4"]
+        }}
+
+        If the following topics are relevant, include them in the output exactly as they are without any modification along with any new topics you find.
+        Only include topics that are relevant to the text content, do not include topics that are not relevant to the text content.
+
+        The current topics are:
+
+        {current_topics}
+
+        Text content:
+        {text_content}
+        """
+    # Large documents are represented by excerpts from across the text
+    prompt = prompts.build(
+        "extract-topics", template,
+        current_topics=Flexible("\n".join(current_topics) if current_topics else "None", "lines", CURRENT_TOPICS_TOKENS),
+        text_content=Flexible(text_content, "spread"),
+    )
+
+    content = await llm.client.chat(prompt, temperature=0.7)
+    if content is None:
+        raise ValueError("Empty response from OpenAI")
+    # Clean up the response
+    content = content.strip()
+    content = content.replace("```json\n", "").replace("\n```", "").replace("```", "")
+    topics = json.loads(content).get("topics", [])
+    await llm_cache.set(cache_key, topics, kind="extract-topics")
+    return topics, status
+
+
+async def generate_document_name(text_content: str, bypass: bool = False) -> Tuple[str, str]:
+    """A concise title for text_content; returns (title, cache status)"""
+    # Only the start of the document reaches the prompt
+    cache_key = make_key(
+        "generate-document-name",
+        llm.client.model,
+        text_content=normalize_text(text_content[:NAME_PROMPT_CHARS]),
+    )
+    title, status = await _cached(cache_key, bypass)
+    if title is not None:
+        return title, status
+
+    template = """
+        You are a document naming assistant. Please analyze the following text and generate a concise title (maximum 60 characters) that captures the main topic or theme of the document.
+        Generate a clear, professional title that would help users identify this document. Return only the title, no quotes or additional text.
+
+        Text content:
+        {text_content}...
+        """
+    prompt = prompts.build(
+        "generate-document-name", template, text_content=Flexible(text_content[:NAME_PROMPT_CHARS]),
+    )
+
+    title = await llm.client.chat(prompt, temperature=0.7)
+    if title is None:
+        raise ValueError("Empty response from OpenAI")
+    title = title.strip()
+    # Remove quotes if present
+    title = title.replace('"', '').replace("'", "")
+    await llm_cache.set(cache_key, title, kind="generate-document-name")
+    return title, status
@@ -0,0 +1,257 @@
+"""Background ingestion jobs: parse an upload, then extract topics and name it.
+
+POST /ingest/jobs stores the upload in the ingest_uploads GridFS bucket,
+queues a job in the ingest_jobs collection and returns its id at once.
+Workers claim queued jobs with an atomic update, so any number of them can
+share the queue: the ones started with the API (INGEST_WORKERS per worker
+process) and any dedicated processes run with ingest_worker.py. A job whose
+worker died is picked up again once its lease expires.
+
+Topic extraction and naming only need the parsed text, so they run
+concurrently once parsing is done. Clients poll GET /ingest/jobs/{job_id},
+which reports each stage's progress and, when the job is done, its result.
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from bson import Binary, ObjectId
+from gridfs.errors import NoFile
+from pymongo import ReturnDocument
+
+import db
+import ingest
+import llm
+
+logger = logging.getLogger(__name__)
+
+# Job workers started with each API process; 0 leaves jobs to ingest_worker.py
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '2'))
+# Seconds between queue checks when idle (jobs submitted to this process wake workers at once)
+INGEST_POLL_SECONDS = float(os.getenv('INGEST_POLL_SECONDS', '1'))
+# Seconds a claimed job may run before another worker may take it over
+INGEST_JOB_LEASE_SECONDS = int(os.getenv('INGEST_JOB_LEASE_SECONDS', '600'))
+# Claims of one job before it is failed rather than retried
+INGEST_MAX_ATTEMPTS = int(os.getenv('INGEST_MAX_ATTEMPTS', '3'))
+# Seconds finished jobs are kept; queued and running jobs are kept until they finish
+INGEST_JOB_TTL_SECONDS = int(os.getenv('INGEST_JOB_TTL_SECONDS', str(24 * 3600)))
+
+STAGES = ("parse", "topics", "title")
+
+
+async def setup():
+    jobs = db.ingest_jobs_collection()
+    await jobs.create_index([("status", 1), ("created_at", 1)])
+    # Only finished jobs expire; a queued job still needs its upload
+    await jobs.create_index("finished_at", expireAfterSeconds=INGEST_JOB_TTL_SECONDS)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _spool(data: bytes, suffix: str) -> str:
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        tmp.write(data)
+    return tmp.name
+
+
+async def submit(path: str, digest: str, filename: str, kind: str,
+                 current_topics: Optional[List[str]] = None) -> Dict:
+    """Queue a spooled upload for ingestion; the caller still removes path"""
+    job_id = ObjectId()
+    data = await asyncio.to_thread(_read_file, path)
+    await db.ingest_uploads_bucket().upload_from_stream_with_id(job_id, filename, data)
+    now = datetime.utcnow()
+    job = {
+        "_id": job_id,
+        "status": "queued",
+        "filename": filename,
+        "kind": kind,
+        "digest": digest,
+        "current_topics": current_topics or [],
+        "stages": {stage: {"status": "pending"} for stage in STAGES},
+        "attempts": 0,
+        "lease_until": None,
+        "error": None,
+        "finished_at": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+    await db.ingest_jobs_collection().insert_one(job)
+    workers.wake()
+    logger.info(f"Queued ingestion job {job_id} for {filename}")
+    return job
+
+
+async def get(job_id: str) -> Optional[Dict]:
+    if not ObjectId.is_valid(job_id):
+        return None
+    return await db.ingest_jobs_collection().find_one({"_id": ObjectId(job_id)})
+
+
+def to_api(job: Dict) -> Dict:
+    """A job's status as returned to clients; the result is included once it is done"""
+    view = {
+        "job_id": str(job["_id"]),
+        "status": job["status"],
+        "filename": job["filename"],
+        "stages": job["stages"],
+        "error": job.get("error"),
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+    if job["status"] == "done":
+        view.update(job["result"])
+        view["text_content"] = zlib.decompress(job["text"]).decode("utf-8")
+    return view
+
+
+async def _claim() -> Optional[Dict]:
+    now = datetime.utcnow()
+    return await db.ingest_jobs_collection().find_one_and_update(
+        {"$or": [{"status": "queued"}, {"status": "running", "lease_until": {"$lt": now}}]},
+        {
+            "$set": {
+                "status": "running",
+                "lease_until": now + timedelta(seconds=INGEST_JOB_LEASE_SECONDS),
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _update(job: Dict, fields: Dict) -> bool:
+    """Update the job if this run still owns it"""
+    # Matching the attempt means a worker whose lease was taken over can't overwrite the new run
+    fields["updated_at"] = datetime.utcnow()
+    result = await db.ingest_jobs_collection().update_one(
+        {"_id": job["_id"], "attempts": job["attempts"]}, {"$set": fields}
+    )
+    return result.matched_count > 0
+
+
+async def _stage(job: Dict, name: str, work):
+    """Await work as the named stage, recording its progress on the job"""
+    await _update(job, {f"stages.{name}.status": "running"})
+    started = time.perf_counter()
+    try:
+        result = await work
+    except Exception:
+        await _update(job, {f"stages.{name}.status": "failed"})
+        raise
+    await _update(job, {f"stages.{name}": {"status": "done", "seconds": round(time.perf_counter() - started, 3)}})
+    return result
+
+
+async def _process(job: Dict) -> bool:
+    if llm.client is None:
+        raise RuntimeError("OpenAI client not initialized")
+    stream = await db.ingest_uploads_bucket().open_download_stream(job["_id"])
+    data = await stream.read()
+    path = await asyncio.to_thread(_spool, data, job["kind"])
+    try:
+        text = await _stage(job, "parse", ingest.parse_upload(path, job["kind"], job["digest"], job["filename"]))
+    finally:
+        os.remove(path)
+
+    # Both only need the text, so they run side by side
+    (topics, _), (title, _) = await asyncio.gather(
+        _stage(job, "topics", ingest.extract_topics(text, job["current_topics"])),
+        _stage(job, "title", ingest.generate_document_name(text)),
+    )
+    text_data = await asyncio.to_thread(zlib.compress, text.encode("utf-8"))
+    return await _update(job, {
+        "status": "done",
+        "result": {"topics": topics, "title": title, "content_length": len(text)},
+        "text": Binary(text_data),
+        "lease_until": None,
+        "finished_at": datetime.utcnow(),
+    })
+
+
+async def _delete_upload(job_id: ObjectId):
+    try:
+        await db.ingest_uploads_bucket().delete(job_id)
+    except NoFile:
+        pass
+
+
+async def run(job: Dict):
+    """Run a claimed job to completion, recording its result or error"""
+    started = time.perf_counter()
+    try:
+        if job["attempts"] > INGEST_MAX_ATTEMPTS:
+            raise RuntimeError(f"Gave up after {INGEST_MAX_ATTEMPTS} attempts")
+        finished = await _process(job)
+        logger.info(f"Ingestion job {job['_id']} done in {time.perf_counter() - started:.2f}s")
+    except asyncio.CancelledError:
+        # Shutting down; the job is taken over once its lease expires
+        raise
+    except Exception as e:
+        logger.error(f"Ingestion job {job['_id']} failed: {e}")
+        finished = await _update(job, {
+            "status": "failed", "error": str(e), "lease_until": None, "finished_at": datetime.utcnow(),
+        })
+    # A run that lost its lease leaves the upload to the run that took over
+    if finished:
+        await _delete_upload(job["_id"])
+
+
+class IngestWorkers:
+    """Workers that claim and run queued ingestion jobs"""
+
+    def __init__(self, workers: int = INGEST_WORKERS):
+        self.workers = workers
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks = []
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.workers:
+            logger.info(f"Started ingestion workers (workers={self.workers})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self):
+        """Have idle workers check the queue now rather than at their next poll"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await _claim()
+            except Exception as e:
+                logger.error(f"Error claiming ingestion job: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), INGEST_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await run(job)
+            except Exception as e:
+                # A job left running is taken over once its lease expires
+                logger.error(f"Error running ingestion job {job['_id']}: {e}")
+
+
+workers = IngestWorkers()
@@ -0,0 +1,53 @@
+"""Dedicated ingestion worker process.
+
+Runs ingestion jobs (see ingest_jobs) outside the API processes, which can
+then be started with INGEST_WORKERS=0. Start as many as the host has room
+for; they share the queue in MongoDB.
+
+    python ingest_worker.py --workers 4
+"""
+
+import argparse
+import asyncio
+
+from dotenv import load_dotenv
+
+# Load .env before importing modules that read configuration at import time
+load_dotenv()
+
+import db  # noqa: E402
+import ingest_jobs  # noqa: E402
+import llm  # noqa: E402
+import parsing  # noqa: E402
+import prompts  # noqa: E402
+from cache import llm_cache, parsed_cache  # noqa: E402
+
+
+
+async def main(args):
+    await db.connect()
+    llm.connect()
+    parsing.start()
+    await llm_cache.setup()
+    await parsed_cache.setup()
+    await ingest_jobs.setup()
+    await prompts.setup()
+    ingest_jobs.workers.workers = args.workers
+    ingest_jobs.workers.start()
+    try:
+        # Run until interrupted
+        await asyncio.Event().wait()
+    finally:
+        await ingest_jobs.workers.stop()
+        await llm.close()
+        parsing.stop()
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=max(ingest_jobs.INGEST_WORKERS, 1))
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+import random
+import time
+
+import openai
+
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+# Point at any OpenAI-compatible server (e.g. benchmarks/fake_openai.py) for local testing
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None
+# Maximum number of in-flight completions per worker
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', '32'))
+# Per-request timeout in seconds
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '30'))
+# Retries on 429/5xx/timeouts, with exponential backoff and jitter
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '3'))
+OPENAI_BACKOFF_BASE = float(os.getenv('OPENAI_BACKOFF_BASE', '0.5'))
+OPENAI_BACKOFF_MAX = float(os.getenv('OPENAI_BACKOFF_MAX', '8'))
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+)
+
+
+class LLMClient:
+    """Non-blocking chat completion client with a global in-flight limit"""
+
+    def __init__(self, api_key=None, base_url=None, model=OPENAI_MODEL,
+                 max_concurrency=OPENAI_MAX_CONCURRENCY, timeout=OPENAI_TIMEOUT,
+                 max_retries=OPENAI_MAX_RETRIES):
+        # Retries are handled here so backoff sleeps don't hold a concurrency slot
+        self._client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def _backoff(self, attempt, error):
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), OPENAI_BACKOFF_MAX)
+            except ValueError:
+                pass
+        delay = min(OPENAI_BACKOFF_BASE * (2 ** attempt), OPENAI_BACKOFF_MAX)
+        return delay * (0.5 + random.random() / 2)
+
+    async def chat(self, prompt: str, temperature: float = 0.7, timeout=None) -> str:
+        """Run a single-message chat completion and return the message content"""
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    response = await self._timed_create(prompt, temperature, timeout or self.timeout)
+                return response.choices[0].message.content
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    logger.error(f"OpenAI request failed after {attempt + 1} attempts: {e}")
+                    raise
+                delay = self._backoff(attempt, e)
+                logger.warning(f"OpenAI request failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def _timed_create(self, prompt: str, temperature: float, timeout: float):
+        """One completion attempt, recorded in the OpenAI metrics and as a trace span"""
+        started = time.perf_counter()
+        with tracing.span("openai.chat", model=self.model) as span:
+            try:
+                response = await self._client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=temperature,
+                    timeout=timeout,
+                )
+            except Exception as e:
+                metrics.openai_request_duration.observe(time.perf_counter() - started, model=self.model, outcome="error")
+                metrics.openai_errors.inc(model=self.model, error=type(e).__name__)
+                raise
+        metrics.openai_request_duration.observe(time.perf_counter() - started, model=self.model, outcome="success")
+        usage = response.usage
+        if usage is not None:
+            metrics.openai_tokens.inc(usage.prompt_tokens, model=self.model, kind="prompt")
+            metrics.openai_tokens.inc(usage.completion_tokens, model=self.model, kind="completion")
+            if span is not None:
+                span.set_attribute("openai.prompt_tokens", usage.prompt_tokens)
+                span.set_attribute("openai.completion_tokens", usage.completion_tokens)
+        return response
+
+    async def close(self):
+        await self._client.close()
+
+
+# Shared client, created once at app startup by connect()
+client = None
+
+
+def connect():
+    """Create the shared LLM client"""
+    global client
+    if client is not None:
+        return
+    try:
+        client = LLMClient(api_key=os.getenv("OPENAI_API_KEY"), base_url=OPENAI_BASE_URL)
+        logger.info(f"Initialized OpenAI client (max_concurrency={OPENAI_MAX_CONCURRENCY})")
+    except Exception as e:
+        logger.warning(f"Failed to initialize OpenAI client: {e}")
+        client = None
+
+
+async def close():
+    """Close the shared LLM client"""
+    global client
+    if client is not None:
+        await client.close()
+    client = None
@@ -1,24 +1,82 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Header, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-import PyPDF2
-from docx import Document as DocxDocument
-import pymongo
-import io
-from models.User import UserDB, User
-from models.Document import Document, CreateDocumentRequest, UpdateScoresRequest, UpdateQuestionsRequest
-from pydantic import BaseModel
-from typing import Dict, List, Optional
-import uuid
-from datetime import datetime
-from bson import ObjectId
-from db import documents_collection
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from dotenv import load_dotenv
-import os
-import openai
 
+# Load .env before importing modules that read configuration at import time
 load_dotenv()
 
-app = FastAPI()
+from contextlib import asynccontextmanager
+from models.User import UserDB, USER_FIELDS
+from models.Document import DocumentDB, CreateDocumentRequest, UpdateScoresRequest, UpdateQuestionsRequest, QuizResultsRequest, DOCUMENT_FIELDS, PREVIEW_CHARS
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, parse_fields
+from pydantic import BaseModel, Field, model_validator
+from typing import Dict, List, Optional
+import db
+import document_content
+import http_cache
+import ingest
+import ingest_jobs
+import metrics
+import tracing
+import llm
+import quiz
+import parsing
+import prompts
+import question_pool
+import question_index
+import retrieval
+import topic_scores
+import random
+import asyncio
+from cache import llm_cache, parsed_cache, document_text_cache
+from retrieval import BM25Index
+from serialization import MongoJSONResponse
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create the shared MongoDB connection pool once per worker
+    tracing.start()
+    await db.connect()
+    if db.MONGO_ENSURE_INDEXES:
+        await db.ensure_indexes()
+    try:
+        await db.check_indexes()
+    except Exception as e:
+        # Only a diagnostic report, so it mustn't keep the API from starting
+        logger.warning(f"Could not check MongoDB indexes: {e}")
+    llm.connect()
+    parsing.start()
+    await llm_cache.setup()
+    await parsed_cache.setup()
+    await question_pool.setup()
+    await retrieval.setup()
+    await question_index.setup()
+    await ingest_jobs.setup()
+    await prompts.setup()
+    question_pool.refiller.start()
+    ingest_jobs.workers.start()
+    topic_scores.migration.start()
+    document_content.migration.start(PREVIEW_CHARS)
+    yield
+    await document_content.migration.stop()
+    await topic_scores.migration.stop()
+    await ingest_jobs.workers.stop()
+    await question_pool.refiller.stop()
+    await llm.close()
+    parsing.stop()
+    db.close()
+    tracing.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -29,70 +87,183 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize OpenAI client
-try:
-    openai_client = openai.OpenAI(
-        api_key=os.getenv("OPENAI_API_KEY")
-    )
-except Exception as e:
-    print(f"Warning: Failed to initialize OpenAI client: {e}")
-    openai_client = None
+# Compress large JSON responses (streams are left as they are)
+app.add_middleware(http_cache.CompressionMiddleware)
+# Outermost, so request latency includes compression
+app.add_middleware(metrics.MetricsMiddleware)
 
 # AI Models
-class ExtractTopicsRequest(BaseModel):
-    text_content: str
+class TextSourceRequest(BaseModel):
+    """Text to work on, sent inline or read from a stored document by ID"""
+    text_content: Optional[str] = None
+    document_id: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_source(self):
+        if self.text_content is None and self.document_id is None:
+            raise ValueError("Either text_content or document_id is required")
+        return self
+
+class ExtractTopicsRequest(TextSourceRequest):
     current_topics: Optional[List[str]] = []
 
-class GenerateQuizRequest(BaseModel):
-    text_content: str
+class GenerateQuizRequest(TextSourceRequest):
     topic: str
     previous_questions: Optional[List[str]] = []
 
-class GenerateDocumentNameRequest(BaseModel):
-    text_content: str
+class GenerateQuizBatchRequest(TextSourceRequest):
+    topics: List[str] = []
+    num_questions: int = Field(default=5, ge=1, le=50)
+    previous_questions: Optional[List[str]] = []
+
+class DocumentQuizRequest(BaseModel):
+    topics: List[str] = []
+    num_questions: int = Field(default=10, ge=1, le=50)
+    previous_questions: Optional[List[str]] = []
+    fill_missing: bool = True
+
+class GenerateDocumentNameRequest(TextSourceRequest):
+    pass
 
 
 @app.get("/")
 def read_root():
     return {"message": "Hello, World CD with webhook test!"}
 
+@app.get("/metrics")
+def get_metrics():
+    """Request, MongoDB, OpenAI and parsing metrics in the Prometheus text format"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.post("/parse_file")
 async def parse_file(file: UploadFile = File(...)):
     try:
-        print(file)
-        file_content = await file.read()
-        filename = file.filename.lower() if file.filename else ""
+        kind = parsing.file_kind(file.filename)
+        if not kind:
+            return {"success": False, "error": "Unsupported file type. Supported formats: PDF, DOCX, TXT, MD"}
         
-        if filename.endswith('.pdf'):
-            # Parse PDF file
-            pdf_file = io.BytesIO(file_content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            text_content = ""
-            for idx, page in enumerate(pdf_reader.pages):
-                text_content += f"Page {idx + 1}\n"
-                text_content += page.extract_text() + "\n"
-            return {"success": True, "data": {"text_content": text_content.strip()}}
-            
-        elif filename.endswith('.docx'):
-            # Parse DOCX file
-            docx_file = io.BytesIO(file_content)
-            doc = DocxDocument(docx_file)
-            text_content = ""
-            for paragraph in doc.paragraphs:
-                text_content += paragraph.text + "\n"
-            return {"success": True, "data": {"text_content": text_content.strip()}}
-            
-        elif filename.endswith(('.txt', '.md')):
-            # Parse plain text files
-            text_content = file_content.decode('utf-8')
-            return {"success": True, "data": {"text_content": text_content}}
-            
-        else:
-            return {"success": False, "error": f"Unsupported file type. Supported formats: PDF, DOCX, TXT, MD"}
+        text_content = await ingest.parse_uploaded(file, kind)
+        return {"success": True, "data": {"text_content": text_content}}
             
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+async def _iterate(items):
+    for item in items:
+        yield item
+
+class _CleanupStreamingResponse(StreamingResponse):
+    """StreamingResponse whose background task also runs if the client disconnects before the stream ends"""
+
+    async def __call__(self, scope, receive, send):
+        background, self.background = self.background, None
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if background is not None:
+                await background()
+
+@app.post("/parse_file/stream")
+async def parse_file_stream(file: UploadFile = File(...)):
+    """Stream extracted text as NDJSON, one line per page as it is extracted"""
+    kind = parsing.file_kind(file.filename)
+    if not kind:
+        return {"success": False, "error": "Unsupported file type. Supported formats: PDF, DOCX, TXT, MD"}
+    
+    path, digest = await parsing.spool_upload(file, suffix=kind)
+    try:
+        cache_key = parsed_cache.make_key(digest, kind)
+        cached = await parsed_cache.get(cache_key)
+    except Exception:
+        os.remove(path)
+        raise
+    
+    async def lines():
+        page = 0
+        pieces = []
+        try:
+            source = parsing.iter_pages(path, kind) if cached is None else _iterate(cached)
+            async for text in source:
+                page += 1
+                pieces.append(text)
+                yield json.dumps({"page": page, "text": text}) + "\n"
+            if cached is None:
+                await parsed_cache.set(cache_key, pieces, filename=file.filename)
+            yield json.dumps({"done": True, "pages": page}) + "\n"
+        except Exception as e:
+            yield json.dumps({"success": False, "error": str(e)}) + "\n"
+    
+    # The spooled file is removed however the response ends, even if the stream never starts
+    return _CleanupStreamingResponse(
+        lines(), media_type="application/x-ndjson", background=BackgroundTask(os.remove, path)
+    )
+
+@app.post("/ingest")
+async def ingest_file(
+    file: UploadFile = File(...),
+    user_id: str = Form(...),
+    current_topics: List[str] = Form(default=[]),
+    include_content: bool = Form(default=False),
+):
+    """Parse an upload, extract its topics and name it concurrently, and save it as a document, in one request"""
+    kind = parsing.file_kind(file.filename)
+    if not kind:
+        raise HTTPException(status_code=400, detail="Unsupported file type. Supported formats: PDF, DOCX, TXT, MD")
+    try:
+        if llm.client is None:
+            raise HTTPException(status_code=500, detail="OpenAI client not initialized")
+        text_content = await ingest.parse_uploaded(file, kind)
+
+        # The user's scores are read while the model names the document and extracts its topics
+        (topics, _), (title, _), user = await asyncio.gather(
+            ingest.extract_topics(text_content, current_topics),
+            ingest.generate_document_name(text_content),
+            UserDB.get_user(user_id),
+        )
+        # Topics start from the user's current score, as when the client creates the document
+        user_scores = topic_scores.to_dict(user["topic_scores"]) if user else {}
+        document_data = await _store_document(
+            user_id, text_content, title, [{topic: user_scores.get(topic, 0.0)} for topic in topics]
+        )
+        if not include_content:
+            # The client already has the file; don't send its text back
+            document_data.pop("document_content")
+        return MongoJSONResponse({"success": True, "data": {"document": document_data, "topics": topics, "title": title}})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.post("/ingest/jobs", status_code=202)
+async def submit_ingest_job(file: UploadFile = File(...), current_topics: List[str] = Form(default=[])):
+    """Queue an upload for parsing, topic extraction and naming; poll GET /ingest/jobs/{job_id} for the result"""
+    kind = parsing.file_kind(file.filename)
+    if not kind:
+        raise HTTPException(status_code=400, detail="Unsupported file type. Supported formats: PDF, DOCX, TXT, MD")
+    try:
+        async with ingest.spooled(file, kind) as (path, digest):
+            job = await ingest_jobs.submit(path, digest, file.filename, kind, current_topics)
+        return MongoJSONResponse({"success": True, "data": ingest_jobs.to_api(job)}, status_code=202)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.get("/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    """Progress of an ingestion job, with its topics, title and text once done"""
+    try:
+        job = await ingest_jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Ingestion job {job_id} not found")
+        return MongoJSONResponse({"success": True, "data": ingest_jobs.to_api(job)})
+    except HTTPException:
+        # e.g. 404s, which the generic handler would turn into 500s
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.get("/parse_file/cache/stats")
+async def get_parse_cache_stats():
+    """Hit/miss counters for the parsed document cache"""
+    return {"success": True, "data": parsed_cache.get_stats()}
+
 # New User API Endpoints
 class CreateUserRequest(BaseModel):
     user_id: str
@@ -105,30 +276,60 @@ class UpdateUserScoresRequest(BaseModel):
 async def create_user(request: CreateUserRequest):
     """Create a new user"""
     try:
-        new_user = UserDB.create_user(request.user_id, request.topic_scores)
-        return {"success": True, "data": new_user, "message": f"User {request.user_id} created successfully"}
+        new_user = await UserDB.create_user(request.user_id, request.topic_scores)
+        return MongoJSONResponse({"success": True, "data": new_user, "message": f"User {request.user_id} created successfully"})
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.get("/users")
-async def get_all_users():
-    """Get all users"""
+async def get_all_users(
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """Get a page of users"""
     try:
-        users = UserDB.get_all_users()
-        return {"success": True, "data": users}
+        users, next_cursor = await UserDB.list_users(limit, cursor, parse_fields(fields, USER_FIELDS))
+        return MongoJSONResponse({"success": True, "data": users, "next_cursor": next_cursor})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.get("/users/{user_id}")
-async def get_user(user_id: str):
+async def get_user(user_id: str, if_none_match: Optional[str] = Header(default=None)):
     """Get a single user by user_id"""
     try:
-        user = UserDB.get_user(user_id)
+        user = await UserDB.get_user(user_id)
         if user is None:
             raise HTTPException(status_code=404, detail=f"User {user_id} not found")
-        return {"success": True, "data": user}
+        # Users carry no modification time, so the version is the record itself
+        tag = http_cache.etag(user)
+        if http_cache.is_fresh(if_none_match, tag):
+            return http_cache.not_modified(tag)
+        response = MongoJSONResponse({"success": True, "data": user})
+        http_cache.set_validators(response, tag)
+        return response
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.get("/users/{user_id}/mastery")
+async def get_user_mastery(user_id: str, if_none_match: Optional[str] = Header(default=None)):
+    """Per-topic mastery for a user's dashboard, kept up to date by each quiz result"""
+    try:
+        topics = await UserDB.get_mastery(user_id)
+        if topics is None:
+            raise HTTPException(status_code=404, detail=f"User {user_id} not found")
+        tag = http_cache.etag(topics)
+        if http_cache.is_fresh(if_none_match, tag):
+            return http_cache.not_modified(tag)
+        response = MongoJSONResponse({"success": True, "data": {"user_id": user_id, "topics": topics}})
+        http_cache.set_validators(response, tag)
+        return response
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -136,7 +337,7 @@ async def get_user(user_id: str):
 async def delete_user(user_id: str):
     """Delete a user by user_id"""
     try:
-        deleted = UserDB.delete_user(user_id)
+        deleted = await UserDB.delete_user(user_id)
         if not deleted:
             raise HTTPException(status_code=404, detail=f"User {user_id} not found")
         return {"success": True, "message": f"User {user_id} has been deleted"}
@@ -147,10 +348,10 @@ async def delete_user(user_id: str):
 async def update_user_scores(user_id: str, request: UpdateUserScoresRequest):
     """Update topic scores for a user (replaces all topic scores)"""
     try:
-        updated_user = UserDB.update_user_scores(user_id, request.topic_scores)
+        updated_user = await UserDB.update_user_scores(user_id, request.topic_scores)
         if updated_user is None:
             raise HTTPException(status_code=404, detail=f"User {user_id} not found")
-        return {"success": True, "data": updated_user, "message": f"User {user_id} scores updated successfully"}
+        return MongoJSONResponse({"success": True, "data": updated_user, "message": f"User {user_id} scores updated successfully"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -158,55 +359,76 @@ async def update_user_scores(user_id: str, request: UpdateUserScoresRequest):
 # Document API Endpoints
 
 # Document API Endpoints
+async def _store_document(user_id: str, document_content: str, title: str,
+                          topic_scores: List[Dict[str, float]], questions: Optional[List[str]] = None) -> Dict:
+    """Create a document, index it and start filling its question pools"""
+    document_data = await DocumentDB.create_document(
+        user_id,
+        document_content,
+        title=title,
+        topic_scores=topic_scores,
+        questions=questions,
+    )
+    
+    # Chunk and index the document once for topic retrieval
+    await retrieval.index_document(document_data["_id"], document_content)
+    
+    # Start pre-generating questions for the document's topics
+    for score_item in topic_scores:
+        for topic in score_item:
+            question_pool.refiller.schedule(document_data["_id"], topic)
+    return document_data
+
 @app.post("/documents")
 async def create_document(request: CreateDocumentRequest):
     """Create a new document"""
     try:
-        now = datetime.utcnow()
-        
-        document_data = {
-            "user_id": request.user_id,
-            "title": request.title,
-            "document_content": request.document_content,
-            "topic_scores": request.topic_scores,
-            "questions": request.questions,
-            "created_at": now,
-            "updated_at": now
-        }
-        
-        result = documents_collection.insert_one(document_data)
-        document_data["_id"] = str(result.inserted_id)
-        
-        return {"success": True, "data": document_data, "message": "Document created successfully"}
+        document_data = await _store_document(
+            request.user_id,
+            request.document_content,
+            request.title,
+            request.topic_scores,
+            request.questions,
+        )
+        return MongoJSONResponse({"success": True, "data": document_data, "message": "Document created successfully"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.get("/documents/{document_id}")
-async def get_document(document_id: str):
+async def get_document(document_id: str, if_none_match: Optional[str] = Header(default=None)):
     """Get a specific document by ID"""
     try:
-        doc = documents_collection.find_one({"_id": ObjectId(document_id)})
+        doc = await DocumentDB.get_document(document_id, include_content=False)
         if doc:
-            doc["_id"] = str(doc["_id"])
-            return {"success": True, "data": doc}
+            # Every write bumps updated_at and the content never changes, so
+            # a revalidation is answered without reading the content
+            tag = http_cache.etag(doc["_id"], doc.get("updated_at"))
+            if http_cache.is_fresh(if_none_match, tag):
+                return http_cache.not_modified(tag)
+            doc["document_content"] = await DocumentDB.get_document_content(document_id) or ""
+            response = MongoJSONResponse({"success": True, "data": doc})
+            http_cache.set_validators(response, tag)
+            return response
         else:
             raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.get("/documents")
-async def get_documents(user_id: Optional[str] = None):
-    """Get all documents, optionally filtered by user_id"""
+async def get_documents(
+    user_id: Optional[str] = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """Get a page of documents, optionally filtered by user_id"""
     try:
-        if user_id:
-            docs = list(documents_collection.find({"user_id": user_id}))
-        else:
-            docs = list(documents_collection.find())
-        
-        for doc in docs:
-            doc["_id"] = str(doc["_id"])
-        
-        return {"success": True, "data": docs}
+        docs, next_cursor = await DocumentDB.list_documents(
+            user_id, limit, cursor, parse_fields(fields, DOCUMENT_FIELDS)
+        )
+        return MongoJSONResponse({"success": True, "data": docs, "next_cursor": next_cursor})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -214,49 +436,14 @@ async def get_documents(user_id: Optional[str] = None):
 async def update_document_scores(document_id: str, request: UpdateScoresRequest):
     """Update topic scores for a document"""
     try:
-        # Get current document
-        doc = documents_collection.find_one({"_id": ObjectId(document_id)})
-        if not doc:
+        updated_doc = await DocumentDB.update_document_scores(document_id, request.topic_scores)
+        if updated_doc is None:
             raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
-        
-        # Convert topic scores to the format stored in DB
-        scores_dict = {}
-        for score_item in request.topic_scores:
-            for topic, score in score_item.items():
-                scores_dict[topic] = score
-        
-        # Update existing topic scores and add new ones
-        current_scores = {}
-        for score_item in doc.get("topic_scores", []):
-            for topic, score in score_item.items():
-                current_scores[topic] = score
-        
-        current_scores.update(scores_dict)
-        
-        # Convert back to list format
-        updated_scores = [{topic: score} for topic, score in current_scores.items()]
-        
-        # Update the document
-        result = documents_collection.update_one(
-            {"_id": ObjectId(document_id)},
-            {
-                "$set": {
-                    "topic_scores": updated_scores,
-                    "updated_at": datetime.utcnow()
-                }
-            }
-        )
-        
-        if result.modified_count > 0:
-            updated_doc = documents_collection.find_one({"_id": ObjectId(document_id)})
-            if updated_doc:
-                updated_doc["_id"] = str(updated_doc["_id"])
-                return {"success": True, "data": updated_doc, "message": "Document scores updated successfully"}
-            else:
-                raise HTTPException(status_code=500, detail="Failed to retrieve updated document")
-        else:
-            raise HTTPException(status_code=500, detail="Failed to update document scores")
+        return MongoJSONResponse({"success": True, "data": updated_doc, "message": "Document scores updated successfully"})
             
+    except HTTPException:
+        # e.g. 404s, which the generic handler would turn into 500s
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -264,39 +451,67 @@ async def update_document_scores(document_id: str, request: UpdateScoresRequest)
 async def update_document_questions(document_id: str, request: UpdateQuestionsRequest):
     """Update questions for a document - keeps only the last 10 questions"""
     try:
-        # Get current document
-        doc = documents_collection.find_one({"_id": ObjectId(document_id)})
-        if not doc:
+        updated_doc = await DocumentDB.update_document_questions(document_id, request.questions)
+        if updated_doc is None:
+            raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+        return MongoJSONResponse({"success": True, "data": updated_doc, "message": "Document questions updated successfully"})
+            
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.post("/documents/{document_id}/quiz-results")
+async def submit_quiz_results(document_id: str, request: QuizResultsRequest):
+    """Save a finished quiz: document questions and scores, and the user's scores, in one request"""
+    try:
+        doc, user = await DocumentDB.record_quiz_results(document_id, request.user_id, request.results)
+        if doc is None:
+            raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
+        return MongoJSONResponse({"success": True, "data": {"document": doc, "user": user}, "message": "Quiz results saved successfully"})
+    except HTTPException:
+        # e.g. 404s, which the generic handler would turn into 500s
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.post("/documents/{document_id}/quiz")
+async def get_document_quiz(document_id: str, request: DocumentQuizRequest):
+    """Serve a quiz from the document's pre-generated question pool"""
+    try:
+        doc = await DocumentDB.get_document(document_id, include_content=False)
+        if doc is None:
             raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
         
-        # Get existing questions and add new ones
-        existing_questions = doc.get("questions", [])
-        all_questions = existing_questions + request.questions
+        topics = request.topics or [topic for score_item in doc.get("topic_scores", []) for topic in score_item]
+        topics = topics or ["general"]
+        previous_questions = doc.get("questions", []) + (request.previous_questions or [])
         
-        # Keep only the last 10 questions
-        updated_questions = all_questions[-10:] if len(all_questions) > 10 else all_questions
+        questions = await question_pool.take(document_id, topics, request.num_questions, previous_questions)
+        pooled = len(questions)
         
-        # Update the document
-        result = documents_collection.update_one(
-            {"_id": ObjectId(document_id)},
-            {
-                "$set": {
-                    "questions": updated_questions,
-                    "updated_at": datetime.utcnow()
-                }
-            }
-        )
+        # Generate anything the pool couldn't cover on demand
+        if request.fill_missing and pooled < request.num_questions:
+            if llm.client is None:
+                raise HTTPException(status_code=500, detail="OpenAI client not initialized")
+            index = await retrieval.load_document_index(document_id) or BM25Index([])
+            questions += await quiz.generate_questions(
+                None,
+                topics,
+                request.num_questions - pooled,
+                previous_questions + [q["question"] for q in questions],
+                index=index,
+                document_id=document_id,
+            )
         
-        if result.modified_count > 0:
-            updated_doc = documents_collection.find_one({"_id": ObjectId(document_id)})
-            if updated_doc:
-                updated_doc["_id"] = str(updated_doc["_id"])
-                return {"success": True, "data": updated_doc, "message": "Document questions updated successfully"}
-            else:
-                raise HTTPException(status_code=500, detail="Failed to retrieve updated document")
-        else:
-            raise HTTPException(status_code=500, detail="Failed to update document questions")
+        # Top the pools back up in the background
+        for topic in topics:
+            question_pool.refiller.schedule(document_id, topic)
+        
+        random.shuffle(questions)
+        return {"success": True, "data": {"questions": questions, "pooled": pooled}}
             
+    except HTTPException:
+        # e.g. 404s, which the generic handler would turn into 500s
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -304,8 +519,12 @@ async def update_document_questions(document_id: str, request: UpdateQuestionsRe
 async def delete_document(document_id: str):
     """Delete a document"""
     try:
-        result = documents_collection.delete_one({"_id": ObjectId(document_id)})
-        if result.deleted_count > 0:
+        deleted = await DocumentDB.delete_document(document_id)
+        if deleted:
+            await question_pool.delete_document_pool(document_id)
+            await retrieval.delete_document_index(document_id)
+            await question_index.delete_document_history(document_id)
+            document_text_cache.discard(document_id)
             return {"success": True, "message": f"Document {document_id} has been deleted"}
         else:
             raise HTTPException(status_code=404, detail=f"Document {document_id} not found")
@@ -314,50 +533,47 @@ async def delete_document(document_id: str):
 
 # AI Endpoints
 
+async def _load_text(request: TextSourceRequest) -> str:
+    """The request's text, read from the referenced document when document_id is set"""
+    if request.document_id is None:
+        return request.text_content
+    text = document_text_cache.get(request.document_id)
+    if text is None:
+        text = await DocumentDB.get_document_content(request.document_id)
+        if text is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        document_text_cache.set(request.document_id, text)
+    return text
+
+async def _load_index(request: TextSourceRequest) -> BM25Index:
+    """Retrieval index for a quiz request, using the document's persisted chunks when possible"""
+    if request.document_id is None:
+        return await retrieval.get_text_index(request.text_content)
+    index = await retrieval.load_document_index(request.document_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return index
+
+@app.get("/ai/cache/stats")
+async def get_llm_cache_stats():
+    """Hit/miss counters for the LLM response cache"""
+    return {"success": True, "data": llm_cache.get_stats()}
+
 @app.post("/ai/extract-topics")
-async def extract_topics(request: ExtractTopicsRequest):
+async def extract_topics(
+    request: ExtractTopicsRequest,
+    response: Response,
+    x_cache_bypass: Optional[str] = Header(default=None),
+):
     """Extract topics from text content"""
+    text_content = await _load_text(request)
     try:
-        if openai_client is None:
+        if llm.client is None:
             raise HTTPException(status_code=500, detail="OpenAI client not initialized")
-            
-        prompt = f"""
-        You are a topic extraction assistant. Please analyze the following text and extract 1-4 key topics that would be suitable for creating quiz questions.
-        Only extract topics that are relevant to the text content.
-
-        Output format:
-        {{
-            "topics": ["Topic 1", "Topic 2", "Topic 3", "Topic 4"]
-        }}
-
-        If the following topics are relevant, include them in the output exactly as they are without any modification along with any new topics you find. 
-        Only include topics that are relevant to the text content, do not include topics that are not relevant to the text content.
-
-        The current topics are:
-
-        {', '.join(request.current_topics) if request.current_topics else 'None'}
-
-        Text content:
-        {request.text_content}
-        """
-
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-        )
-
-        content = response.choices[0].message.content
-        # Parse the response
         try:
-            import json
-            # Clean up the response
-            if content is None:
-                raise HTTPException(status_code=500, detail="Empty response from OpenAI")
-            content = content.strip()
-            content = content.replace("```json\n", "").replace("\n```", "").replace("```", "")
-            parsed = json.loads(content)
-            topics = parsed.get("topics", [])
+            topics, response.headers["X-Cache"] = await ingest.extract_topics(
+                text_content, request.current_topics, bypass=bool(x_cache_bypass)
+            )
             return {"success": True, "data": {"topics": topics}}
         except json.JSONDecodeError:
             raise HTTPException(status_code=500, detail="Failed to parse AI response")
@@ -368,60 +584,16 @@ async def extract_topics(request: ExtractTopicsRequest):
 @app.post("/ai/generate-quiz")
 async def generate_quiz(request: GenerateQuizRequest):
     """Generate a single quiz question"""
+    index = await _load_index(request)
     try:
-        if openai_client is None:
+        if llm.client is None:
             raise HTTPException(status_code=500, detail="OpenAI client not initialized")
             
-        # Create a more explicit prompt to avoid repetition
-        previous_questions_text = ""
-        if request.previous_questions:
-            previous_questions_text = "PREVIOUS QUESTIONS TO AVOID:\n"
-            for i, q in enumerate(request.previous_questions, 1):
-                previous_questions_text += f"{i}. {q}\n"
-        
-        prompt = f"""
-        You are a quiz generator. Generate a SINGLE, UNIQUE question based on the topic: {request.topic}.
-
-        CRITICAL REQUIREMENTS:
-        1. Generate EXACTLY ONE question
-        2. The question MUST be completely different from any previous questions, not even similar to them.
-        3. Focus on different aspects of the topic that haven't been covered
-        4. Use different question formats (multiple choice, true/false, fill-in-the-blank, etc.)
-        5. Base the question ONLY on the provided text content
-
-        {previous_questions_text}
-
-        TOPIC: {request.topic}
-        TEXT CONTENT: {request.text_content[:2000]}...
-
-        OUTPUT FORMAT (JSON only):
-        {{
-            "question": "What is the capital of France?",
-            "options": ["Paris", "London", "Berlin", "Madrid"],
-            "answer": "Paris"
-        }}
-
-        IMPORTANT: Ensure your question is completely different from the previous questions listed above.
-        """
-
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,  # Increased temperature for more variety
-        )
-
-        content = response.choices[0].message.content
-        # Parse the response
         try:
-            import json
-            # Clean up the response
-            if content is None:
-                raise HTTPException(status_code=500, detail="Empty response from OpenAI")
-            content = content.strip()
-            content = content.replace("```json\n", "").replace("\n```", "").replace("```", "")
-            parsed = json.loads(content)
-            # Add the topic to the response
-            parsed["topic"] = request.topic
+            parsed = await quiz.generate_question(
+                request.text_content, request.topic, request.previous_questions, index=index,
+                document_id=request.document_id,
+            )
             return {"success": True, "data": parsed}
         except json.JSONDecodeError:
             raise HTTPException(status_code=500, detail="Failed to parse AI response")
@@ -429,34 +601,76 @@ async def generate_quiz(request: GenerateQuizRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@app.post("/ai/generate-document-name")
-async def generate_document_name(request: GenerateDocumentNameRequest):
-    """Generate a document name based on content"""
+@app.post("/ai/generate-quiz/batch")
+async def generate_quiz_batch(request: GenerateQuizBatchRequest):
+    """Generate a full set of unique quiz questions across topics"""
+    index = await _load_index(request)
     try:
-        if openai_client is None:
+        if llm.client is None:
             raise HTTPException(status_code=500, detail="OpenAI client not initialized")
             
-        prompt = f"""
-        You are a document naming assistant. Please analyze the following text and generate a concise title (maximum 60 characters) that captures the main topic or theme of the document.
-        Generate a clear, professional title that would help users identify this document. Return only the title, no quotes or additional text.
-
-        Text content:
-        {request.text_content[:1000]}...
-        """
-
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
+        questions = await quiz.generate_questions(
+            request.text_content,
+            request.topics,
+            request.num_questions,
+            request.previous_questions,
+            index=index,
+            document_id=request.document_id,
         )
+        if not questions:
+            raise HTTPException(status_code=500, detail="Failed to generate quiz questions")
+        return {"success": True, "data": {"questions": questions}}
+            
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-        title = response.choices[0].message.content
-        if title is None:
-            raise HTTPException(status_code=500, detail="Empty response from OpenAI")
-        title = title.strip()
-        # Remove quotes if present
-        title = title.replace('"', '').replace("'", "")
-        
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/ai/generate-quiz/stream")
+async def generate_quiz_stream(request: GenerateQuizBatchRequest):
+    """Stream quiz questions as Server-Sent Events as soon as each one is generated"""
+    if llm.client is None:
+        raise HTTPException(status_code=500, detail="OpenAI client not initialized")
+    index = await _load_index(request)
+
+    async def events():
+        count = 0
+        try:
+            async for question in quiz.iter_questions(
+                request.text_content,
+                request.topics,
+                request.num_questions,
+                request.previous_questions,
+                index=index,
+                document_id=request.document_id,
+            ):
+                count += 1
+                yield _sse("question", question)
+            yield _sse("done", {"count": count})
+        except Exception as e:
+            yield _sse("error", {"detail": f"Internal server error: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/ai/generate-document-name")
+async def generate_document_name(
+    request: GenerateDocumentNameRequest,
+    response: Response,
+    x_cache_bypass: Optional[str] = Header(default=None),
+):
+    """Generate a document name based on content"""
+    text_content = await _load_text(request)
+    try:
+        if llm.client is None:
+            raise HTTPException(status_code=500, detail="OpenAI client not initialized")
+        title, response.headers["X-Cache"] = await ingest.generate_document_name(
+            text_content, bypass=bool(x_cache_bypass)
+        )
         return {"success": True, "data": {"title": title}}
             
     except Exception as e:
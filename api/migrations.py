@@ -0,0 +1,38 @@
+"""Online data migrations run in the background at startup.
+
+Each migration must be safe to run while the API serves traffic; running it
+as a task means startup isn't held up by large collections.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundMigration:
+    """A migration started with the API and cancelled on shutdown"""
+
+    def __init__(self, name: str, migrate: Callable[..., Awaitable], enabled: bool = True):
+        self.name = name
+        self.migrate = migrate
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, *args):
+        """Run migrate(*args) in the background, if enabled and not already started"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run(*args))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self, *args):
+        try:
+            await self.migrate(*args)
+        except Exception as e:
+            logger.error(f"{self.name} migration failed: {e}")
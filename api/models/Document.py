@@ -2,13 +2,42 @@ from typing import List, Optional, Dict
 from pydantic import BaseModel
 from datetime import datetime
 from bson import ObjectId
+import asyncio
+from pymongo import ReturnDocument
 import logging
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Import database connection
-from db import documents_collection
+import db
+from db import documents_collection, users_collection
+from pagination import DEFAULT_PAGE_SIZE, cursor_filter, split_page
+import document_content as content_store
+import topic_scores as scores_format
+
+# Fields a client may select when listing documents
+DOCUMENT_FIELDS = ("user_id", "title", "document_content", "topic_scores", "questions", "created_at", "updated_at")
+# Most recent questions kept on a document
+QUESTION_WINDOW = 10
+# Characters of document_content kept on the record for listing summaries
+PREVIEW_CHARS = 200
+# The content lives in GridFS (see the document_content module); never read it back with
+# the record, which may still hold it inline until migrated
+WITHOUT_CONTENT = {"document_content": 0}
+
+# Default listing projection: enough to render a document card without its full content or questions
+SUMMARY_PROJECTION = {
+    "user_id": 1,
+    "title": 1,
+    "topic_scores": 1,
+    "scores": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "preview": {"$ifNull": ["$preview", {"$substrCP": [{"$ifNull": ["$document_content", ""]}, 0, PREVIEW_CHARS]}]},
+    "content_length": 1,
+    "question_count": {"$size": {"$ifNull": ["$questions", []]}},
+}
 
 
 class PyObjectId(ObjectId):
@@ -43,6 +72,18 @@ class UpdateScoresRequest(BaseModel):
     topic_scores: List[Dict[str, float]]
 
 
+class QuizResult(BaseModel):
+    question: str
+    topic: str
+    # None for a question left unanswered
+    correct: Optional[bool] = None
+
+
+class QuizResultsRequest(BaseModel):
+    user_id: Optional[str] = None
+    results: List[QuizResult]
+
+
 class Document(BaseModel):
     id: Optional[str] = None
     user_id: str
@@ -56,123 +97,234 @@ class Document(BaseModel):
 
 class DocumentDB:
     @staticmethod
-    def create_document(user_id: str, document_content: str, title: Optional[str] = None):
+    async def create_document(user_id: str, document_content: str, title: Optional[str] = None,
+                              topic_scores: Optional[List[Dict[str, float]]] = None,
+                              questions: Optional[List[str]] = None):
         """Create a new document"""
         try:
             # Generate a default title if none provided
             if title is None:
                 title = f"Document {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}"
             
+            now = datetime.utcnow()
+            document_id = ObjectId()
+            # Content first, so a stored record always has its content
+            await content_store.save(document_id, document_content)
             document_data = {
+                "_id": document_id,
                 "user_id": user_id,
                 "title": title,
-                "topic_scores": [],
-                "document_content": document_content,
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
+                "preview": document_content[:PREVIEW_CHARS],
+                "content_length": len(document_content),
+                "scores": scores_format.to_map(topic_scores, now),
+                "questions": questions or [],
+                "created_at": now,
+                "updated_at": now
             }
-            result = documents_collection.insert_one(document_data)
-            document_data["_id"] = str(result.inserted_id)
+            await documents_collection().insert_one(document_data)
+            document_data["_id"] = str(document_id)
+            document_data["document_content"] = document_content
             logger.info(f"Created document for user {user_id}")
-            return document_data
+            return scores_format.to_api(document_data)
         except Exception as e:
             logger.error(f"Error creating document for user {user_id}: {e}")
             raise
 
     @staticmethod
-    def get_document(document_id: str):
-        """Get a document by ID"""
+    async def get_document(document_id: str, include_content: bool = True):
+        """Get a document by ID, reading its content from GridFS only if include_content"""
         try:
-            doc = documents_collection.find_one({"_id": ObjectId(document_id)})
+            doc = await documents_collection().find_one(
+                {"_id": ObjectId(document_id)}, None if include_content else WITHOUT_CONTENT
+            )
             if doc:
+                if include_content and "document_content" not in doc:
+                    doc["document_content"] = await content_store.load(doc["_id"]) or ""
                 doc['_id'] = str(doc['_id'])
-                return doc
+                return scores_format.to_api(doc)
             return None
         except Exception as e:
             logger.error(f"Error getting document {document_id}: {e}")
             return None
 
     @staticmethod
-    def get_documents_by_user(user_id: str):
-        """Get all documents for a user"""
+    async def get_document_content(document_id: str) -> Optional[str]:
+        """Get only a document's text content, or None if the document doesn't exist"""
         try:
-            docs = list(documents_collection.find({"user_id": user_id}))
-            for doc in docs:
-                doc['_id'] = str(doc['_id'])
-            return docs
+            text = await content_store.load(ObjectId(document_id))
+            if text is not None:
+                return text
+            # Not migrated yet, or no document at all
+            doc = await documents_collection().find_one(
+                {"_id": ObjectId(document_id)}, {"document_content": 1, "_id": 0}
+            )
+            return doc.get("document_content", "") if doc else None
         except Exception as e:
-            logger.error(f"Error getting documents for user {user_id}: {e}")
-            raise
+            logger.error(f"Error getting content of document {document_id}: {e}")
+            return None
 
     @staticmethod
-    def get_all_documents():
-        """Get all documents"""
+    async def list_documents(user_id: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                             cursor: Optional[str] = None, fields: Optional[List[str]] = None):
+        """Get one page of documents, most recently updated first, optionally filtered by user.
+
+        Without fields each document is a summary (see SUMMARY_PROJECTION);
+        otherwise only the named fields are returned. Returns the page and the
+        cursor of the next page, or None on the last page.
+        """
         try:
-            docs = list(documents_collection.find())
+            query = cursor_filter(cursor, "updated_at")
+            if user_id:
+                query["user_id"] = user_id
+            if fields is None:
+                projection = SUMMARY_PROJECTION
+            else:
+                projection = {field: 1 for field in fields}
+                projection["updated_at"] = 1
+                if "topic_scores" in projection:
+                    projection["scores"] = 1
+            docs = await documents_collection().aggregate([
+                {"$match": query},
+                {"$sort": {"updated_at": -1, "_id": -1}},
+                {"$limit": limit + 1},
+                {"$project": projection},
+            ]).to_list(length=None)
+            docs, next_cursor = split_page(docs, limit, "updated_at")
+            if fields is not None and "document_content" in fields:
+                # Only records not yet migrated still carry their content inline
+                stored = [doc for doc in docs if "document_content" not in doc]
+                contents = await asyncio.gather(*(content_store.load(doc["_id"]) for doc in stored))
+                for doc, text in zip(stored, contents):
+                    doc["document_content"] = text or ""
+            # _id stays an ObjectId; MongoJSONResponse encodes it
             for doc in docs:
-                doc['_id'] = str(doc['_id'])
-            return docs
+                scores_format.to_api(doc)
+            return docs, next_cursor
+        except ValueError:
+            raise
         except Exception as e:
-            logger.error(f"Error getting all documents: {e}")
+            logger.error(f"Error listing documents for user {user_id}: {e}")
             raise
 
     @staticmethod
-    def update_document_scores(document_id: str, topic_scores: List[Dict[str, float]]):
-        """Update topic scores for a document"""
+    async def update_document_scores(document_id: str, topic_scores: List[Dict[str, float]]):
+        """Merge topic scores into a document: given topics are overwritten, others kept"""
         try:
-            # Get current document
-            doc = documents_collection.find_one({"_id": ObjectId(document_id)})
-            if not doc:
+            # Each topic is its own field, so this is one atomic in-place
+            # update and concurrent results for different topics can't clash
+            now = datetime.utcnow()
+            update = scores_format.merge_update(topic_scores, now)
+            update.setdefault("$set", {})["updated_at"] = now
+            updated_doc = await documents_collection().find_one_and_update(
+                {"_id": ObjectId(document_id)},
+                update,
+                projection=WITHOUT_CONTENT,
+                return_document=ReturnDocument.AFTER,
+            )
+            if updated_doc is None:
                 return None
-            
-            # Convert topic scores to the format stored in DB
-            scores_dict = {}
-            for score_item in topic_scores:
-                for topic, score in score_item.items():
-                    scores_dict[topic] = score
-            
-            # Update existing topic scores and add new ones
-            current_scores = {}
-            for score_item in doc.get("topic_scores", []):
-                for topic, score in score_item.items():
-                    current_scores[topic] = score
-            
-            current_scores.update(scores_dict)
-            
-            # Convert back to list format
-            updated_scores = [{topic: score} for topic, score in current_scores.items()]
-            
-            # Update the document
-            result = documents_collection.update_one(
+            updated_doc['_id'] = str(updated_doc['_id'])
+            logger.info(f"Updated document scores for document {document_id}")
+            return scores_format.to_api(updated_doc)
+
+        except Exception as e:
+            logger.error(f"Error updating document scores for {document_id}: {e}")
+            raise
+
+    @staticmethod
+    async def update_document_questions(document_id: str, questions: List[str]):
+        """Append questions to a document, keeping only the last 10"""
+        try:
+            updated_doc = await documents_collection().find_one_and_update(
                 {"_id": ObjectId(document_id)},
                 {
-                    "$set": {
-                        "topic_scores": updated_scores,
-                        "updated_at": datetime.utcnow()
-                    }
-                }
+                    "$push": {"questions": {"$each": questions, "$slice": -QUESTION_WINDOW}},
+                    "$set": {"updated_at": datetime.utcnow()},
+                },
+                projection=WITHOUT_CONTENT,
+                return_document=ReturnDocument.AFTER,
             )
-            
-            if result.modified_count > 0:
-                updated_doc = documents_collection.find_one({"_id": ObjectId(document_id)})
-                updated_doc['_id'] = str(updated_doc['_id'])
-                logger.info(f"Updated document scores for document {document_id}")
-                return updated_doc
-            return None
-            
+            if updated_doc is None:
+                return None
+            updated_doc['_id'] = str(updated_doc['_id'])
+            logger.info(f"Updated document questions for document {document_id}")
+            return scores_format.to_api(updated_doc)
+
         except Exception as e:
-            logger.error(f"Error updating document scores for {document_id}: {e}")
-            return None
+            logger.error(f"Error updating document questions for {document_id}: {e}")
+            raise
+
+    @staticmethod
+    async def record_quiz_results(document_id: str, user_id: Optional[str], results: List[QuizResult]):
+        """Apply a finished quiz to its document and user in one step.
+
+        The quiz's questions join the document's question window, each topic's
+        quiz score replaces the document's score for it, and the same answers
+        move the user's running scores. On replica sets and sharded clusters
+        both writes commit in a single transaction; elsewhere they run one
+        after the other. Returns the updated document and user (None if either
+        doesn't exist).
+        """
+        try:
+            now = datetime.utcnow()
+            steps = scores_format.quiz_steps(results)
+            document_scores = [{topic: scores_format.fold(topic_steps)} for topic, topic_steps in steps.items()]
+            document_update = scores_format.merge_update(document_scores, now)
+            document_update.setdefault("$set", {})["updated_at"] = now
+            document_update["$push"] = {
+                "questions": {"$each": [result.question for result in results], "$slice": -QUESTION_WINDOW}
+            }
+
+            async def update_document(session=None):
+                return await documents_collection().find_one_and_update(
+                    {"_id": ObjectId(document_id)}, document_update, projection=WITHOUT_CONTENT,
+                    return_document=ReturnDocument.AFTER, session=session,
+                )
+
+            async def update_user(session=None):
+                if not user_id or not steps:
+                    return None
+                return await users_collection().find_one_and_update(
+                    {"user_id": user_id}, scores_format.apply_steps_pipeline(steps, now),
+                    return_document=ReturnDocument.AFTER, session=session,
+                )
+
+            async def update_both(session=None):
+                # The user is only updated if the document exists
+                doc = await update_document(session)
+                if doc is None:
+                    return None, None
+                return doc, await update_user(session)
+
+            if await db.supports_transactions():
+                async with await db.client.start_session() as session:
+                    doc, user = await session.with_transaction(update_both)
+            else:
+                doc, user = await update_both()
+
+            if doc is None:
+                return None, None
+            doc['_id'] = str(doc['_id'])
+            if user is not None:
+                user['_id'] = str(user['_id'])
+                scores_format.to_api(user)
+            logger.info(f"Recorded quiz results for document {document_id}")
+            return scores_format.to_api(doc), user
+
+        except Exception as e:
+            logger.error(f"Error recording quiz results for {document_id}: {e}")
+            raise
 
     @staticmethod
-    def delete_document(document_id: str):
+    async def delete_document(document_id: str):
         """Delete a document"""
         try:
-            result = documents_collection.delete_one({"_id": ObjectId(document_id)})
+            result = await documents_collection().delete_one({"_id": ObjectId(document_id)})
             if result.deleted_count > 0:
+                await content_store.delete(ObjectId(document_id))
                 logger.info(f"Deleted document {document_id}")
                 return True
             return False
         except Exception as e:
             logger.error(f"Error deleting document {document_id}: {e}")
-            return False 
\ No newline at end of file
+            return False 
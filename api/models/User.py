@@ -1,6 +1,9 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from datetime import datetime
 from pydantic import BaseModel, validator
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import logging
 
 # Configure logging
@@ -8,6 +11,17 @@ logger = logging.getLogger(__name__)
 
 # Import database connection
 from db import users_collection
+from pagination import DEFAULT_PAGE_SIZE, cursor_filter, split_page
+import topic_scores as scores_format
+
+# Fields a client may select when listing users
+USER_FIELDS = ("user_id", "topic_scores")
+
+# Default listing projection: a user's topic count rather than every score
+SUMMARY_PROJECTION = {
+    "user_id": 1,
+    "topic_count": scores_format.count_expression(),
+}
 
 class TopicScore(BaseModel):
     topic: str
@@ -31,56 +45,85 @@ class User(BaseModel):
 
 class UserDB:
     @staticmethod
-    def create_user(user_id: str, topic_scores: Optional[List[Dict[str, float]]] = None) -> Dict:
+    async def create_user(user_id: str, topic_scores: Optional[List[Dict[str, float]]] = None) -> Dict:
         """Create a new user document"""
         try:
             if topic_scores is None:
                 topic_scores = []
-            existing_user = users_collection.find_one({"user_id": user_id})
-            if existing_user:
-                raise ValueError(f"User {user_id} already exists")
             user_doc = {
                 "user_id": user_id,
-                "topic_scores": topic_scores
+                "scores": scores_format.to_map(topic_scores, datetime.utcnow())
             }
-            result = users_collection.insert_one(user_doc)
+            # The unique user_id index rejects duplicates atomically
+            try:
+                result = await users_collection().insert_one(user_doc)
+            except DuplicateKeyError:
+                raise ValueError(f"User {user_id} already exists")
             user_doc['_id'] = str(result.inserted_id)
             logger.info(f"Created user document for user {user_id}")
-            return user_doc
+            return scores_format.to_api(user_doc)
         except Exception as e:
             logger.error(f"Error creating user for {user_id}: {e}")
             raise
 
     @staticmethod
-    def get_user(user_id: str) -> Optional[Dict]:
+    async def get_user(user_id: str) -> Optional[Dict]:
         """Get a user by user_id"""
         try:
-            user = users_collection.find_one({"user_id": user_id})
+            user = await users_collection().find_one({"user_id": user_id})
             if user:
                 user['_id'] = str(user['_id'])
-                return user
+                return scores_format.to_api(user)
             return None
         except Exception as e:
             logger.error(f"Error getting user {user_id}: {e}")
             raise
 
     @staticmethod
-    def get_all_users() -> List[Dict]:
-        """Get all users from the database"""
+    async def get_mastery(user_id: str) -> Optional[List[Dict]]:
+        """A user's per-topic mastery rollup (see topic_scores.mastery_to_api)"""
+        try:
+            user = await users_collection().find_one({"user_id": user_id}, {"scores": 1, "topic_scores": 1})
+            if user is None:
+                return None
+            return scores_format.mastery_to_api(user)
+        except Exception as e:
+            logger.error(f"Error getting mastery for user {user_id}: {e}")
+            raise
+
+    @staticmethod
+    async def list_users(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                         fields: Optional[List[str]] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Get one page of users, newest first, and the cursor of the next page.
+
+        Without fields each user is a summary (see SUMMARY_PROJECTION).
+        """
         try:
-            users = list(users_collection.find())
+            projection = SUMMARY_PROJECTION if fields is None else {field: 1 for field in fields}
+            if "topic_scores" in projection:
+                projection["scores"] = 1
+            users = await users_collection().aggregate([
+                {"$match": cursor_filter(cursor)},
+                {"$sort": {"_id": -1}},
+                {"$limit": limit + 1},
+                {"$project": projection},
+            ]).to_list(length=None)
+            users, next_cursor = split_page(users, limit)
+            # _id stays an ObjectId; MongoJSONResponse encodes it
             for user in users:
-                user['_id'] = str(user['_id'])
-            return users
+                scores_format.to_api(user)
+            return users, next_cursor
+        except ValueError:
+            raise
         except Exception as e:
-            logger.error(f"Error getting all users: {e}")
+            logger.error(f"Error listing users: {e}")
             raise
 
     @staticmethod
-    def delete_user(user_id: str) -> bool:
+    async def delete_user(user_id: str) -> bool:
         """Delete a user by user_id"""
         try:
-            result = users_collection.delete_one({"user_id": user_id})
+            result = await users_collection().delete_one({"user_id": user_id})
             if result.deleted_count > 0:
                 logger.info(f"Deleted user {user_id}")
                 return True
@@ -90,21 +133,19 @@ class UserDB:
             raise
 
     @staticmethod
-    def update_user_scores(user_id: str, topic_scores: List[Dict[str, float]]) -> Optional[Dict]:
+    async def update_user_scores(user_id: str, topic_scores: List[Dict[str, float]]) -> Optional[Dict]:
         """Update topic scores for a user (replaces all topic scores)"""
         try:
-            result = users_collection.update_one(
+            updated_user = await users_collection().find_one_and_update(
                 {"user_id": user_id},
-                {"$set": {"topic_scores": topic_scores}}
+                scores_format.replace_pipeline(topic_scores, datetime.utcnow()),
+                return_document=ReturnDocument.AFTER,
             )
-            if result.matched_count == 0:
+            if updated_user is None:
                 return None
-            updated_user = users_collection.find_one({"user_id": user_id})
-            if updated_user:
-                updated_user['_id'] = str(updated_user['_id'])
-                logger.info(f"Updated topic scores for user {user_id}")
-                return updated_user
-            return None
+            updated_user['_id'] = str(updated_user['_id'])
+            logger.info(f"Updated topic scores for user {user_id}")
+            return scores_format.to_api(updated_user)
         except Exception as e:
             logger.error(f"Error updating user scores for {user_id}: {e}")
             raise
\ No newline at end of file
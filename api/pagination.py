@@ -0,0 +1,61 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+# Page size used when a list endpoint is called without a limit, and the largest allowed
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '200'))
+
+
+def encode_cursor(doc: Dict, sort_field: Optional[str] = None) -> str:
+    """Opaque cursor pointing just past doc in a (sort_field, _id) descending listing"""
+    position = {"id": str(doc["_id"])}
+    if sort_field is not None:
+        value = doc.get(sort_field)
+        position["value"] = value.isoformat() if isinstance(value, datetime) else value
+    raw = json.dumps(position, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def cursor_filter(cursor: Optional[str], sort_field: Optional[str] = None) -> Dict:
+    """Query filter matching documents after cursor; raises ValueError for a malformed cursor"""
+    if not cursor:
+        return {}
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+        last_id = ObjectId(position["id"])
+        if sort_field is None:
+            return {"_id": {"$lt": last_id}}
+        value = position["value"]
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return {"$or": [
+        {sort_field: {"$lt": value}},
+        {sort_field: value, "_id": {"$lt": last_id}},
+    ]}
+
+
+def parse_fields(fields: Optional[str], allowed: Tuple[str, ...]) -> Optional[List[str]]:
+    """Split a comma-separated field selector, rejecting unknown names"""
+    if not fields:
+        return None
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = sorted(set(selected) - set(allowed))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed fields: {', '.join(allowed)}")
+    return selected
+
+
+def split_page(docs: List[Dict], limit: int, sort_field: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """Trim a limit + 1 query result to one page and return it with the next page's cursor"""
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    return docs, encode_cursor(docs[-1], sort_field)
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import hashlib
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Tuple
+
+from fastapi import UploadFile
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Worker processes used for PDF/DOCX extraction
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', str(os.cpu_count() or 1)))
+# Minimum pages extracted per process pool task. Every task re-opens the PDF and
+# walks its page tree, so large documents are split into about two tasks per
+# worker rather than many small ones.
+PARSE_PAGES_PER_TASK = int(os.getenv('PARSE_PAGES_PER_TASK', '16'))
+# Upload bytes copied per read while spooling to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.txt', '.md')
+
+_executor = None
+
+
+def start():
+    """Create the shared extraction process pool"""
+    global _executor
+    if _executor is None:
+        # Forking a process that already runs threads (Motor, to_thread) can copy a held lock
+        # into the child and deadlock it, so workers start from a clean process instead
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context(method))
+        logger.info(f"Started parser process pool (workers={PARSE_WORKERS})")
+
+
+def stop():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+
+def file_kind(filename: str) -> str:
+    """Return the supported extension of filename, or an empty string"""
+    filename = (filename or "").lower()
+    for extension in SUPPORTED_EXTENSIONS:
+        if filename.endswith(extension):
+            return extension
+    return ""
+
+
+# Extraction functions run inside the process pool, so they must stay
+# top-level and take only picklable arguments.
+
+def _count_pdf_pages(path: str) -> int:
+    import PyPDF2
+    return len(PyPDF2.PdfReader(path).pages)
+
+
+def _extract_pdf_pages(path: str, start: int, end: int) -> List[str]:
+    import PyPDF2
+    reader = PyPDF2.PdfReader(path)
+    return [reader.pages[i].extract_text() for i in range(start, end)]
+
+
+def _extract_docx(path: str) -> str:
+    from docx import Document as DocxDocument
+    doc = DocxDocument(path)
+    return "\n".join(paragraph.text for paragraph in doc.paragraphs)
+
+
+def _read_text(path: str) -> str:
+    with open(path, "rb") as f:
+        return f.read().decode('utf-8')
+
+
+async def _run(fn, *args):
+    loop = asyncio.get_running_loop()
+    if _executor is None:
+        # Fall back to a thread so the event loop is never blocked
+        return await loop.run_in_executor(None, fn, *args)
+    return await loop.run_in_executor(_executor, fn, *args)
+
+
+def _copy_and_hash(source, destination) -> str:
+    digest = hashlib.sha256()
+    while True:
+        chunk = source.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        destination.write(chunk)
+    return digest.hexdigest()
+
+
+async def spool_upload(file: UploadFile, suffix: str = "") -> Tuple[str, str]:
+    """Copy an upload to a temporary file on disk in fixed-size chunks.
+
+    Returns the file's path and the SHA-256 of its content. The caller is
+    responsible for removing the file.
+    """
+    tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+    try:
+        await file.seek(0)
+        digest = await asyncio.to_thread(_copy_and_hash, file.file, tmp)
+    finally:
+        tmp.close()
+    return tmp.name, digest
+
+
+def _page_ranges(num_pages: int) -> List[Tuple[int, int]]:
+    size = max(PARSE_PAGES_PER_TASK, -(-num_pages // (PARSE_WORKERS * 2)))
+    return [(start, min(start + size, num_pages)) for start in range(0, num_pages, size)]
+
+
+async def iter_pdf_pages(path: str) -> AsyncIterator[str]:
+    """Yield the text of each PDF page in order, extracting page ranges in parallel"""
+    num_pages = await _run(_count_pdf_pages, path)
+    tasks = [asyncio.ensure_future(_run(_extract_pdf_pages, path, start, end))
+             for start, end in _page_ranges(num_pages)]
+    try:
+        for task in tasks:
+            for text in await task:
+                yield text
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def iter_pages(path: str, kind: str) -> AsyncIterator[str]:
+    """Yield extracted text piece by piece: one per page for PDFs, the whole file otherwise"""
+    started = time.perf_counter()
+    if kind == '.pdf':
+        async for text in iter_pdf_pages(path):
+            yield text
+    elif kind == '.docx':
+        yield await _run(_extract_docx, path)
+    else:
+        yield await _run(_read_text, path)
+    # Includes time the consumer spent between pages, which is small for both parse endpoints
+    metrics.parse_duration.observe(time.perf_counter() - started, kind=kind)
+
+
+async def extract_pieces(path: str, kind: str) -> List[str]:
+    """Extract all pieces of a spooled upload (see iter_pages)"""
+    return [text async for text in iter_pages(path, kind)]
+
+
+def format_text(pieces: List[str], kind: str) -> str:
+    """Join extracted pieces into the text_content returned by /parse_file"""
+    if kind == '.pdf':
+        return "".join(f"Page {idx}\n{text}\n" for idx, text in enumerate(pieces, 1)).strip()
+    elif kind == '.docx':
+        return "".join(pieces).strip()
+    else:
+        return "".join(pieces)
+
+
+async def extract_text(path: str, kind: str) -> str:
+    """Extract the full text content of a spooled upload"""
+    return format_text(await extract_pieces(path, kind), kind)
@@ -0,0 +1,166 @@
+"""Token-budgeted prompt building for the /ai/* endpoints.
+
+build() fills a prompt template and holds it to its endpoint's token budget.
+Parts wrapped in Flexible are shortened, deterministically, until the prompt
+fits. They get what is left after the fixed text, in the order they are
+passed. So the same inputs always produce the same prompt, and completion
+latency and cost stay bounded however large the document is.
+
+Tokens are counted locally with tiktoken when it is installed and its
+encoding was loaded by setup() at startup (tiktoken downloads it on first
+use), and otherwise estimated at CHARS_PER_TOKEN characters per token.
+Each prompt's size is recorded in the prompt_tokens metric.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+import llm
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Token budget per prompt, covering the template and everything put into it
+BUDGETS = {
+    "extract-topics": int(os.getenv('PROMPT_TOKENS_EXTRACT_TOPICS', '4000')),
+    "generate-document-name": int(os.getenv('PROMPT_TOKENS_DOCUMENT_NAME', '400')),
+    "generate-quiz": int(os.getenv('PROMPT_TOKENS_QUIZ', '1500')),
+    "generate-quiz-batch": int(os.getenv('PROMPT_TOKENS_QUIZ_BATCH', '2000')),
+}
+# Estimate used when tiktoken or its encoding is unavailable
+CHARS_PER_TOKEN = 4
+# Text longer than this many characters per token of its allowance can't fit, so it isn't counted
+MAX_CHARS_PER_TOKEN = 16
+# Excerpts taken across a text shortened with the "spread" strategy
+SPREAD_EXCERPTS = 4
+SPREAD_MARKER = "\n[...]\n"
+
+_encoding = None
+
+
+def _load_encoding():
+    try:
+        return tiktoken.encoding_for_model(llm.OPENAI_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+async def setup():
+    """Load the tokenizer off the event loop, so no request waits for its download"""
+    global _encoding
+    if tiktoken is None:
+        return
+    try:
+        _encoding = await asyncio.to_thread(_load_encoding)
+    except Exception as e:
+        logger.warning(f"Could not load a tiktoken encoding, estimating token counts: {e}")
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def _head(text: str, max_tokens: int) -> str:
+    """The leading max_tokens tokens of text"""
+    if max_tokens <= 0:
+        return ""
+    if _encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    # No need to encode more of a large text than could possibly fit
+    tokens = _encoding.encode(text[:max_tokens * MAX_CHARS_PER_TOKEN], disallowed_special=())
+    return _encoding.decode(tokens[:max_tokens])
+
+
+def _lines(text: str, max_tokens: int) -> str:
+    """Whole leading lines of text that fit"""
+    kept = []
+    used = 0
+    for line in text.splitlines():
+        cost = count_tokens(line + "\n")
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept)
+
+
+def _spread(text: str, max_tokens: int) -> str:
+    """Evenly spaced excerpts from across text, starting with its beginning"""
+    per_excerpt = (max_tokens - (SPREAD_EXCERPTS - 1) * count_tokens(SPREAD_MARKER)) // SPREAD_EXCERPTS
+    if per_excerpt < 50:
+        return _head(text, max_tokens)
+    excerpts = []
+    for i in range(SPREAD_EXCERPTS):
+        start = len(text) * i // SPREAD_EXCERPTS
+        if start:
+            # Start at a line or word boundary
+            boundary = text.find("\n", start, start + 500)
+            if boundary == -1:
+                boundary = text.find(" ", start, start + 100)
+            start = start if boundary == -1 else boundary + 1
+        excerpts.append(_head(text[start:], per_excerpt).strip())
+    return SPREAD_MARKER.join(excerpts)
+
+
+STRATEGIES = {"head": _head, "lines": _lines, "spread": _spread}
+
+
+class Flexible:
+    """A prompt part that may be shortened to fit the budget.
+
+    strategy is "head" (keep the start), "lines" (keep whole leading lines)
+    or "spread" (keep excerpts from across the text); max_tokens caps the
+    part whatever the budget leaves.
+    """
+
+    def __init__(self, text: str, strategy: str = "head", max_tokens: Optional[int] = None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown prompt truncation strategy: {strategy}")
+        self.text = text or ""
+        self.strategy = strategy
+        self.max_tokens = max_tokens
+
+
+def fit(text: str, max_tokens: int, strategy: str = "head") -> Tuple[str, int]:
+    """text shortened with strategy to at most max_tokens, and its token count"""
+    # A whole document is only encoded if it could fit
+    if len(text) <= max_tokens * MAX_CHARS_PER_TOKEN:
+        tokens = count_tokens(text)
+        if tokens <= max_tokens:
+            return text, tokens
+    text = STRATEGIES[strategy](text, max_tokens)
+    return text, count_tokens(text)
+
+
+def build(name: str, template: str, **parts) -> str:
+    """Fill template (str.format syntax) with parts, within the budget for name"""
+    budget = BUDGETS[name]
+    fixed = {key: value for key, value in parts.items() if not isinstance(value, Flexible)}
+    flexible = {key: value for key, value in parts.items() if isinstance(value, Flexible)}
+    remaining = budget - count_tokens(template.format(**fixed, **{key: "" for key in flexible}))
+
+    values = {}
+    shortened = []
+    for key, part in flexible.items():
+        allowance = max(0, remaining if part.max_tokens is None else min(remaining, part.max_tokens))
+        values[key], used = fit(part.text, allowance, part.strategy)
+        if values[key] != part.text:
+            shortened.append(key)
+        remaining -= used
+
+    prompt = template.format(**fixed, **values)
+    tokens = count_tokens(prompt)
+    metrics.prompt_tokens.observe(tokens, prompt=name)
+    if shortened:
+        metrics.prompt_truncations.inc(prompt=name)
+        logger.info(f"Shortened {', '.join(shortened)} to fit the {name} prompt in {budget} tokens ({tokens} used)")
+    return prompt
@@ -0,0 +1,156 @@
+"""Near-duplicate detection for quiz questions, per document.
+
+Questions are compared as sets of shingles (content words and adjacent word
+pairs) by Jaccard similarity, so a reworded repeat is caught where an exact
+match would miss it. MinHash signatures with LSH banding narrow each lookup
+to a few candidate comparisons however many questions a document has seen.
+
+Every question generated for a document is recorded in the question_history
+collection. summary() condenses that history into the "already covered"
+section of a generation prompt, in place of the full list of questions.
+"""
+
+import logging
+import os
+import random
+from collections import Counter
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import db
+import retrieval
+
+logger = logging.getLogger(__name__)
+
+# Shingle Jaccard similarity at or above which a question counts as a repeat
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.5'))
+# Most recent questions per document loaded for comparison
+QUESTION_HISTORY_LIMIT = int(os.getenv('QUESTION_HISTORY_LIMIT', '500'))
+# Document indexes kept in memory per worker
+QUESTION_INDEX_CACHE_SIZE = int(os.getenv('QUESTION_INDEX_CACHE_SIZE', '256'))
+# Recent questions quoted and most frequent terms listed in a prompt's covered-ground summary
+SUMMARY_QUESTIONS = int(os.getenv('COVERED_SUMMARY_QUESTIONS', '5'))
+SUMMARY_TERMS = int(os.getenv('COVERED_SUMMARY_TERMS', '12'))
+
+# LSH banding: questions sharing all rows of any band are compared exactly.
+# 16 bands of 2 rows find a pair at Jaccard 0.5 with probability ~0.99.
+MINHASH_BANDS = 16
+MINHASH_ROWS = 2
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(_PRIME)) for _ in range(MINHASH_BANDS * MINHASH_ROWS)]
+
+
+def _stem(token: str) -> str:
+    # Enough to match plurals ("enzyme"/"enzymes")
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def shingles(question: str) -> FrozenSet[str]:
+    tokens = [_stem(token) for token in retrieval.tokenize(question)]
+    return frozenset(tokens) | frozenset(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _bands(question_shingles: FrozenSet[str]) -> List[Tuple]:
+    # hash() is salted per process, which is fine: signatures are never persisted
+    hashes = [hash(shingle) for shingle in question_shingles] or [0]
+    signature = [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+    return [(band, tuple(signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS])) for band in range(MINHASH_BANDS)]
+
+
+class QuestionIndex:
+    """Questions seen so far, searchable for near-duplicates"""
+
+    def __init__(self, questions: Iterable[str] = ()):
+        self._entries: List[Tuple[str, Optional[str], FrozenSet[str]]] = []
+        self._buckets: Dict[Tuple, List[int]] = {}
+        for question in questions:
+            self.add(question)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def copy(self) -> "QuestionIndex":
+        other = QuestionIndex()
+        other._entries = list(self._entries)
+        other._buckets = {key: list(ids) for key, ids in self._buckets.items()}
+        return other
+
+    def find_duplicate(self, question: str) -> Optional[str]:
+        """The indexed question that question repeats, if any"""
+        question_shingles = shingles(question)
+        candidates = {i for key in _bands(question_shingles) for i in self._buckets.get(key, ())}
+        for i in sorted(candidates):
+            if jaccard(question_shingles, self._entries[i][2]) >= NEAR_DUPLICATE_THRESHOLD:
+                return self._entries[i][0]
+        return None
+
+    def add(self, question: str, topic: Optional[str] = None):
+        question_shingles = shingles(question)
+        position = len(self._entries)
+        self._entries.append((question, topic, question_shingles))
+        for key in _bands(question_shingles):
+            self._buckets.setdefault(key, []).append(position)
+
+    def summary(self, topic: Optional[str] = None) -> str:
+        """Compact description of the ground already covered, for a generation prompt"""
+        if not self._entries:
+            return ""
+        on_topic = [question for question, entry_topic, _ in self._entries if entry_topic == topic]
+        recent = (on_topic or [question for question, _, _ in self._entries])[-SUMMARY_QUESTIONS:]
+        terms = Counter(shingle for _, _, entry in self._entries for shingle in entry if " " not in shingle)
+        lines = [f"ALREADY COVERED ({len(self._entries)} earlier questions), ask about something else:"]
+        if terms:
+            lines.append("Key terms already tested: " + ", ".join(term for term, _ in terms.most_common(SUMMARY_TERMS)))
+        lines.append("Most recent questions:")
+        lines += [f"{i}. {question}" for i, question in enumerate(recent, 1)]
+        return "\n".join(lines) + "\n"
+
+
+_cache = retrieval._IndexCache(QUESTION_INDEX_CACHE_SIZE)
+
+
+async def setup():
+    await db.question_history_collection().create_index([("document_id", 1), ("created_at", -1)])
+
+
+async def load(document_id: str) -> QuestionIndex:
+    """The document's question history, shared by every request in this worker"""
+    index = _cache.get(document_id)
+    if index is not None:
+        return index
+    entries = await db.question_history_collection().find(
+        {"document_id": document_id}, {"question": 1, "topic": 1}
+    ).sort("created_at", -1).limit(QUESTION_HISTORY_LIMIT).to_list(length=None)
+    index = QuestionIndex()
+    for entry in reversed(entries):
+        index.add(entry["question"], entry.get("topic"))
+    _cache.set(document_id, index)
+    return index
+
+
+async def record(document_id: str, questions: List[Dict]):
+    """Add generated questions to the document's history"""
+    if not questions:
+        return
+    index = await load(document_id)
+    now = datetime.utcnow()
+    for question in questions:
+        index.add(question["question"], question.get("topic"))
+    await db.question_history_collection().insert_many([
+        {"document_id": document_id, "question": q["question"], "topic": q.get("topic"), "created_at": now}
+        for q in questions
+    ])
+
+
+async def delete_document_history(document_id: str):
+    _cache.discard(document_id)
+    await db.question_history_collection().delete_many({"document_id": document_id})
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List
+
+import db
+import llm
+import quiz
+import retrieval
+from models.Document import DocumentDB
+
+logger = logging.getLogger(__name__)
+
+# Refill a (document, topic) pool once it drops below this many questions...
+POOL_LOW_WATERMARK = int(os.getenv('POOL_LOW_WATERMARK', '5'))
+# ...back up to this many
+POOL_TARGET_SIZE = int(os.getenv('POOL_TARGET_SIZE', '15'))
+# Concurrent background refills per worker
+POOL_REFILL_WORKERS = int(os.getenv('POOL_REFILL_WORKERS', '2'))
+
+
+async def setup():
+    await db.question_pool_collection().create_index([("document_id", 1), ("topic", 1), ("created_at", 1)])
+
+
+async def available(document_id: str, topic: str) -> int:
+    return await db.question_pool_collection().count_documents({"document_id": document_id, "topic": topic})
+
+
+async def _take_topic(document_id: str, topic: str, count: int, avoid: List[str]) -> List[Dict]:
+    taken = []
+    for _ in range(count):
+        # Each claim is atomic, so concurrent quizzes never get the same question
+        entry = await db.question_pool_collection().find_one_and_delete(
+            {"document_id": document_id, "topic": topic, "normalized": {"$nin": avoid}},
+            sort=[("created_at", 1)],
+        )
+        if entry is None:
+            break
+        taken.append(entry["question"])
+    return taken
+
+
+async def take(document_id: str, topics: List[str], num_questions: int, previous_questions: List[str]) -> List[Dict]:
+    """Claim up to num_questions pooled questions, spread across topics.
+
+    Questions matching previous_questions (e.g. the document's recent
+    question window) are skipped and left for a later quiz.
+    """
+    avoid = [quiz.normalize_question(q) for q in previous_questions]
+    counts = quiz.allocate_topics(topics, num_questions)
+    results = await asyncio.gather(
+        *(_take_topic(document_id, topic, count, avoid) for topic, count in counts.items())
+    )
+    return [question for questions in results for question in questions]
+
+
+async def refill(document_id: str, topic: str):
+    """Top the (document, topic) pool back up to POOL_TARGET_SIZE if it is below the watermark"""
+    if llm.client is None:
+        return
+    current = await available(document_id, topic)
+    if current >= POOL_LOW_WATERMARK:
+        return
+    doc = await DocumentDB.get_document(document_id, include_content=False)
+    if doc is None:
+        return
+
+    pooled = await db.question_pool_collection().find(
+        {"document_id": document_id, "topic": topic}, {"question.question": 1}
+    ).to_list(length=None)
+    avoid = doc.get("questions", []) + [entry["question"]["question"] for entry in pooled]
+
+    index = await retrieval.load_document_index(document_id)
+    if index is None:
+        return
+    questions = await quiz.generate_questions(
+        None, [topic], POOL_TARGET_SIZE - current, avoid, index=index, document_id=document_id
+    )
+    if not questions:
+        return
+    now = datetime.utcnow()
+    await db.question_pool_collection().insert_many([
+        {
+            "document_id": document_id,
+            "topic": topic,
+            "question": question,
+            "normalized": quiz.normalize_question(question["question"]),
+            "created_at": now,
+        }
+        for question in questions
+    ])
+    logger.info(f"Refilled question pool for document {document_id}, topic {topic} with {len(questions)} questions")
+
+
+async def delete_document_pool(document_id: str):
+    await db.question_pool_collection().delete_many({"document_id": document_id})
+
+
+class PoolRefiller:
+    """Background workers that refill question pools outside the request path"""
+
+    def __init__(self, workers: int = POOL_REFILL_WORKERS):
+        self.workers = workers
+        self._queue: "asyncio.Queue" = asyncio.Queue()
+        self._pending = set()
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def schedule(self, document_id: str, topic: str):
+        """Queue a refill check, coalescing repeat requests for the same pool"""
+        key = (document_id, topic)
+        if key in self._pending:
+            return
+        self._pending.add(key)
+        self._queue.put_nowait(key)
+
+    async def _worker(self):
+        while True:
+            key = await self._queue.get()
+            try:
+                await refill(*key)
+            except Exception as e:
+                logger.error(f"Error refilling question pool for {key}: {e}")
+            finally:
+                self._pending.discard(key)
+                self._queue.task_done()
+
+
+refiller = PoolRefiller()
@@ -0,0 +1,283 @@
+import asyncio
+import json
+import logging
+import random
+import re
+from typing import AsyncIterator, Dict, List, Optional
+
+import llm
+import prompts
+import question_index
+import retrieval
+from prompts import Flexible
+from question_index import QuestionIndex
+from retrieval import BM25Index
+
+logger = logging.getLogger(__name__)
+
+# Maximum questions requested from the model in a single completion
+QUESTIONS_PER_COMPLETION = 5
+# Extra generation rounds used to replace duplicates or unparseable questions
+MAX_REFILL_ROUNDS = 2
+# Token cap on the covered-ground summary in a prompt; the retrieved context gets the rest of the budget
+COVERED_PROMPT_TOKENS = 300
+
+
+def parse_ai_json(content: Optional[str]):
+    """Parse a JSON object out of a chat completion, stripping markdown fences"""
+    if content is None:
+        raise ValueError("Empty response from OpenAI")
+    content = content.strip()
+    content = content.replace("```json\n", "").replace("\n```", "").replace("```", "")
+    return json.loads(content)
+
+
+def normalize_question(question: str) -> str:
+    """Normalize question text for duplicate detection"""
+    question = re.sub(r"[^\w\s]", "", question.lower())
+    return " ".join(question.split())
+
+
+def is_valid_question(question) -> bool:
+    """Check a generated question has the fields the frontend renders"""
+    return (
+        isinstance(question, dict)
+        and isinstance(question.get("question"), str)
+        and question["question"].strip() != ""
+        and isinstance(question.get("options"), list)
+        and len(question["options"]) >= 2
+        and question.get("answer") in question["options"]
+    )
+
+
+def build_question_prompt(context: str, topic: str, covered: str) -> str:
+    """Prompt for a single quiz question from the retrieved context; covered summarizes earlier questions"""
+    # Create a more explicit prompt to avoid repetition
+    template = """
+        You are a quiz generator. Generate a SINGLE, UNIQUE question based on the topic: {topic}.
+
+        CRITICAL REQUIREMENTS:
+        1. Generate EXACTLY ONE question
+        2. The question MUST be completely different from any previous questions, not even similar to them.
+        3. Focus on different aspects of the topic that haven't been covered
+        4. Use different question formats (multiple choice, true/false, fill-in-the-blank, etc.)
+        5. Base the question ONLY on the provided text content
+
+        {covered}
+
+        TOPIC: {topic}
+        TEXT CONTENT: {context}
+
+        OUTPUT FORMAT (JSON only):
+        {{
+            "question": "What is the capital of France?",
+            "options": ["Paris", "London", "Berlin", "Madrid"],
+            "answer": "Paris"
+        }}
+
+        IMPORTANT: Ensure your question is completely different from the questions already covered.
+        """
+    return prompts.build(
+        "generate-quiz", template,
+        topic=topic, covered=Flexible(covered, "lines", COVERED_PROMPT_TOKENS), context=Flexible(context),
+    )
+
+
+def build_batch_prompt(context: str, topic: str, count: int, covered: str) -> str:
+    """Prompt for several distinct quiz questions on one topic from the retrieved context"""
+    template = """
+        You are a quiz generator. Generate {count} UNIQUE QUESTIONS based on the topic: {topic}.
+
+        CRITICAL REQUIREMENTS:
+        1. Generate EXACTLY {count} questions
+        2. Every question MUST be completely different from the others and from any previous questions, not even similar to them.
+        3. Each question should focus on a different aspect of the topic
+        4. Use different question formats (multiple choice, true/false, fill-in-the-blank, etc.)
+        5. Base the questions ONLY on the provided text content
+
+        {covered}
+
+        TOPIC: {topic}
+        TEXT CONTENT: {context}
+
+        OUTPUT FORMAT (JSON only, with the questions in an ARRAY):
+        {{
+            "questions": [
+                {{
+                    "question": "What is the capital of France?",
+                    "options": ["Paris", "London", "Berlin", "Madrid"],
+                    "answer": "Paris"
+                }}
+            ]
+        }}
+        """
+    return prompts.build(
+        "generate-quiz-batch", template,
+        topic=topic, count=count, covered=Flexible(covered, "lines", COVERED_PROMPT_TOKENS), context=Flexible(context),
+    )
+
+
+def allocate_topics(topics: List[str], num_questions: int) -> Dict[str, int]:
+    """Spread num_questions round-robin across topics"""
+    topics = topics or ["general"]
+    counts = {topic: 0 for topic in topics}
+    for i in range(num_questions):
+        counts[topics[i % len(topics)]] += 1
+    return {topic: count for topic, count in counts.items() if count > 0}
+
+
+async def _seen_questions(document_id: Optional[str], previous_questions: Optional[List[str]]) -> QuestionIndex:
+    """Questions a new one must not repeat: the document's history plus previous_questions"""
+    seen = (await question_index.load(document_id)).copy() if document_id else QuestionIndex()
+    for question in previous_questions or []:
+        seen.add(question)
+    return seen
+
+
+async def generate_question(text_content: str, topic: str, previous_questions: List[str],
+                            index: Optional[BM25Index] = None, document_id: Optional[str] = None) -> Dict:
+    """Generate a single quiz question from the chunks of text_content most relevant to topic.
+
+    Malformed completions and near-duplicates of previous_questions or of
+    the document's earlier questions are regenerated, up to MAX_REFILL_ROUNDS
+    times; if every attempt is rejected, the last rejection is raised as
+    ValueError rather than returning the question.
+    """
+    if index is None:
+        index = await retrieval.get_text_index(text_content)
+    seen = await _seen_questions(document_id, previous_questions)
+    for _ in range(MAX_REFILL_ROUNDS + 1):
+        try:
+            parsed = await _generate_one(index, topic, seen.summary(topic))
+        except ValueError as e:
+            # Unparseable, or JSON that isn't an object
+            logger.warning(f"Quiz completion rejected for topic {topic}: {e}")
+            rejection = e
+            continue
+        if not is_valid_question(parsed):
+            logger.warning(f"Quiz completion rejected for topic {topic}: missing or invalid question fields")
+            rejection = ValueError("Generated question is missing or has invalid fields")
+            continue
+        repeat = seen.find_duplicate(parsed["question"])
+        if repeat is None:
+            break
+        logger.info(f"Near-duplicate question rejected: {parsed['question']!r} repeats {repeat!r}")
+        rejection = ValueError(f"Could not generate a new question on {topic}: every attempt repeated an earlier one")
+    else:
+        raise rejection
+    if document_id:
+        await question_index.record(document_id, [parsed])
+    return parsed
+
+
+async def _generate_one(index: BM25Index, topic: str, covered: str) -> Dict:
+    prompt = build_question_prompt(index.context(topic, vary=True), topic, covered)
+    content = await llm.client.chat(prompt, temperature=0.7)  # Increased temperature for more variety
+    parsed = parse_ai_json(content)
+    if not isinstance(parsed, dict):
+        raise ValueError(f"Expected a JSON object, got {type(parsed).__name__}")
+    # Add the topic to the response
+    parsed["topic"] = topic
+    return parsed
+
+
+async def _generate_for_topic(index: BM25Index, topic: str, count: int, covered: str) -> List[Dict]:
+    if count == 1:
+        return [await _generate_one(index, topic, covered)]
+    prompt = build_batch_prompt(index.context(topic, vary=True), topic, count, covered)
+    content = await llm.client.chat(prompt, temperature=0.7)
+    parsed = parse_ai_json(content)
+    questions = parsed.get("questions", []) if isinstance(parsed, dict) else parsed
+    for question in questions:
+        if isinstance(question, dict):
+            question["topic"] = topic
+    return questions
+
+
+def _plan_completions(counts: Dict[str, int]):
+    plan = []
+    for topic, count in counts.items():
+        while count > 0:
+            size = min(count, QUESTIONS_PER_COMPLETION)
+            plan.append((topic, size))
+            count -= size
+    return plan
+
+
+async def iter_questions(text_content: str, topics: List[str], num_questions: int,
+                         previous_questions: Optional[List[str]] = None,
+                         index: Optional[BM25Index] = None,
+                         document_id: Optional[str] = None) -> AsyncIterator[Dict]:
+    """Yield up to num_questions unique questions across topics as they are generated.
+
+    Completions for every topic run concurrently, each asking for up to
+    QUESTIONS_PER_COMPLETION questions, and each validated question is yielded
+    as soon as its completion returns. Near-duplicates of previous_questions,
+    of each other and, with document_id, of the document's earlier questions
+    are rejected (see question_index); shortfalls are regenerated for up to
+    MAX_REFILL_ROUNDS extra rounds. Questions yielded for a document join its
+    history.
+
+    Each prompt only carries the chunks most relevant to its topic, taken
+    from index (a persisted document index) or an index built from text_content,
+    and a summary of the questions already covered.
+    """
+    if index is None:
+        index = await retrieval.get_text_index(text_content)
+    seen = await _seen_questions(document_id, previous_questions)
+    remaining = allocate_topics(topics, num_questions)
+
+    for _ in range(MAX_REFILL_ROUNDS + 1):
+        if not remaining:
+            break
+        pending = {
+            asyncio.ensure_future(_generate_for_topic(index, topic, size, seen.summary(topic))): topic
+            for topic, size in _plan_completions(remaining)
+        }
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    topic = pending.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        logger.warning(f"Quiz generation failed for topic {topic}: {e}")
+                        continue
+                    accepted = []
+                    for question in result:
+                        if remaining.get(topic, 0) == 0:
+                            break
+                        if not is_valid_question(question):
+                            continue
+                        repeat = seen.find_duplicate(question["question"])
+                        if repeat is not None:
+                            logger.info(f"Near-duplicate question rejected: {question['question']!r} repeats {repeat!r}")
+                            continue
+                        seen.add(question["question"], topic)
+                        accepted.append(question)
+                        remaining[topic] -= 1
+                    if document_id:
+                        await question_index.record(document_id, accepted)
+                    for question in accepted:
+                        yield question
+        finally:
+            # The consumer may stop early (e.g. a streaming client disconnects)
+            for task in pending:
+                task.cancel()
+        remaining = {topic: count for topic, count in remaining.items() if count > 0}
+
+
+async def generate_questions(text_content: str, topics: List[str], num_questions: int,
+                             previous_questions: Optional[List[str]] = None,
+                             index: Optional[BM25Index] = None,
+                             document_id: Optional[str] = None) -> List[Dict]:
+    """Generate num_questions unique questions across topics (see iter_questions)"""
+    questions = [
+        q async for q in iter_questions(text_content, topics, num_questions, previous_questions, index, document_id)
+    ]
+    if len(questions) < num_questions:
+        logger.warning(f"Generated {len(questions)} unique questions out of {num_questions} requested")
+    # Mix topics so the quiz doesn't run topic by topic
+    random.shuffle(questions)
+    return questions
@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import random
+import re
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+import db
+from models.Document import DocumentDB
+
+logger = logging.getLogger(__name__)
+
+# Target characters per chunk and overlap between neighbouring chunks
+CHUNK_CHARS = int(os.getenv('CHUNK_CHARS', '1200'))
+CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', '200'))
+# Characters of retrieved text placed in a quiz prompt
+QUIZ_CONTEXT_CHARS = int(os.getenv('QUIZ_CONTEXT_CHARS', '2000'))
+# Indexes kept in memory per worker
+INDEX_CACHE_SIZE = int(os.getenv('INDEX_CACHE_SIZE', '256'))
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both
+but by can did do does doing down during each few for from further had has have having he her here hers herself
+him himself his how i if in into is it its itself just me more most my myself no nor not now of off on once only
+or other our ours ourselves out over own same she should so some such than that the their theirs them themselves
+then there these they this those through to too under until up very was we were what when where which while who
+whom why will with you your yours yourself yourselves
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS and len(token) > 1]
+
+
+def chunk_text(text: str, chunk_chars: int = CHUNK_CHARS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split text into overlapping chunks, breaking on paragraph or word boundaries"""
+    text = text.strip()
+    if not text:
+        return []
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            # Prefer a paragraph break, then a line break, then a space, in the second half of the chunk
+            for separator in ("\n\n", "\n", " "):
+                cut = text.rfind(separator, start + chunk_chars // 2, end)
+                if cut != -1:
+                    end = cut
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+        # Don't start the next chunk mid-word
+        space = text.find(" ", start, end)
+        if space != -1:
+            start = space + 1
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 index over the chunks of a single document"""
+
+    def __init__(self, chunks: List[str], term_freqs: Optional[List[Dict[str, int]]] = None):
+        self.chunks = chunks
+        self.term_freqs = term_freqs if term_freqs is not None else [dict(Counter(tokenize(c))) for c in chunks]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        self.doc_freqs: Counter = Counter()
+        for tf in self.term_freqs:
+            self.doc_freqs.update(tf.keys())
+
+    @classmethod
+    def from_text(cls, text: str) -> "BM25Index":
+        return cls(chunk_text(text))
+
+    def _idf(self, term: str) -> float:
+        n = len(self.chunks)
+        df = self.doc_freqs.get(term, 0)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def scores(self, query: str) -> List[float]:
+        terms = set(tokenize(query))
+        scores = [0.0] * len(self.chunks)
+        for term in terms:
+            if term not in self.doc_freqs:
+                continue
+            idf = self._idf(term)
+            for i, tf in enumerate(self.term_freqs):
+                freq = tf.get(term)
+                if not freq:
+                    continue
+                norm = 1 - BM25_B + BM25_B * self.lengths[i] / (self.avg_length or 1)
+                scores[i] += idf * freq * (BM25_K1 + 1) / (freq + BM25_K1 * norm)
+        return scores
+
+    def search(self, query: str, k: int = 3) -> List[int]:
+        """Indices of the k best-matching chunks, best first"""
+        scores = self.scores(query)
+        ranked = sorted((i for i, score in enumerate(scores) if score > 0), key=lambda i: -scores[i])
+        return ranked[:k]
+
+    def context(self, query: str, max_chars: int = QUIZ_CONTEXT_CHARS, vary: bool = False) -> str:
+        """Relevant chunks for query, in document order, within max_chars.
+
+        With vary set, chunks are drawn at random from the best few matches so
+        repeated quizzes on one topic see different parts of the document. If
+        nothing matches, chunks are sampled across the whole document.
+        """
+        if not self.chunks:
+            return ""
+        fit = max(1, max_chars // CHUNK_CHARS)
+        selected = self.search(query, k=3 * fit if vary else len(self.chunks))
+        if not selected:
+            selected = list(range(len(self.chunks)))
+            vary = True
+        if vary:
+            selected = random.sample(selected, len(selected))
+        picked = []
+        used = 0
+        for i in selected:
+            if used + len(self.chunks[i]) > max_chars and picked:
+                continue
+            picked.append(i)
+            used += len(self.chunks[i])
+            if used >= max_chars:
+                break
+        return "\n...\n".join(self.chunks[i][:max_chars] for i in sorted(picked))
+
+
+class _IndexCache:
+    def __init__(self, max_size: int = INDEX_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, BM25Index]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[BM25Index]:
+        index = self._entries.get(key)
+        if index is not None:
+            self._entries.move_to_end(key)
+        return index
+
+    def set(self, key: str, index: BM25Index):
+        self._entries[key] = index
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        self._entries.pop(key, None)
+
+
+_cache = _IndexCache()
+
+
+async def setup():
+    await db.document_chunks_collection().create_index([("document_id", 1), ("index", 1)])
+
+
+async def get_text_index(text_content: str) -> BM25Index:
+    """Index for free text sent by a client, cached by content hash"""
+    key = "text:" + hashlib.sha256(text_content.encode("utf-8")).hexdigest()
+    index = _cache.get(key)
+    if index is None:
+        index = await asyncio.to_thread(BM25Index.from_text, text_content)
+        _cache.set(key, index)
+    return index
+
+
+async def index_document(document_id: str, text_content: str) -> BM25Index:
+    """Chunk a document and persist its chunks and term frequencies"""
+    index = await asyncio.to_thread(BM25Index.from_text, text_content)
+    collection = db.document_chunks_collection()
+    await collection.delete_many({"document_id": document_id})
+    if index.chunks:
+        await collection.insert_many([
+            {"document_id": document_id, "index": i, "text": chunk, "terms": tf}
+            for i, (chunk, tf) in enumerate(zip(index.chunks, index.term_freqs))
+        ])
+    _cache.set("doc:" + document_id, index)
+    logger.info(f"Indexed document {document_id} into {len(index.chunks)} chunks")
+    return index
+
+
+async def get_document_index(document_id: str, text_content: Optional[str] = None) -> BM25Index:
+    """Load a document's index, building it from text_content for documents created before indexing"""
+    key = "doc:" + document_id
+    index = _cache.get(key)
+    if index is not None:
+        return index
+    chunks = await db.document_chunks_collection().find(
+        {"document_id": document_id}, {"text": 1, "terms": 1}
+    ).sort("index", 1).to_list(length=None)
+    if chunks:
+        index = BM25Index([c["text"] for c in chunks], [c["terms"] for c in chunks])
+        _cache.set(key, index)
+        return index
+    if text_content is None:
+        return BM25Index([])
+    return await index_document(document_id, text_content)
+
+
+async def load_document_index(document_id: str) -> Optional[BM25Index]:
+    """A document's index, reading its text only if it was never indexed; None if there is no such document"""
+    index = await get_document_index(document_id)
+    if index.chunks:
+        return index
+    text_content = await DocumentDB.get_document_content(document_id)
+    if text_content is None:
+        return None
+    return await get_document_index(document_id, text_content)
+
+
+async def delete_document_index(document_id: str):
+    _cache.discard("doc:" + document_id)
+    await db.document_chunks_collection().delete_many({"document_id": document_id})
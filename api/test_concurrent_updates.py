@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Concurrency test for document score and question updates
+Run this after starting your FastAPI server
+"""
+
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_URL = "http://localhost:8000"
+CONCURRENCY = 50
+QUESTION_WINDOW = 10
+
+
+def put(path, data):
+    response = requests.put(f"{BASE_URL}{path}", json=data)
+    response.raise_for_status()
+    return response.json()["data"]
+
+
+def test_concurrent_updates():
+    print("🧪 Testing concurrent document updates\n")
+
+    response = requests.post(f"{BASE_URL}/documents", json={
+        "user_id": "concurrency-test",
+        "title": "Concurrency Test",
+        "document_content": "Concurrent updates should never be lost.",
+        "topic_scores": [{"existing": 5.0}],
+        "questions": [],
+    })
+    response.raise_for_status()
+    document_id = response.json()["data"]["_id"]
+    failures = 0
+
+    try:
+        # Every request scores a different topic; with a read-merge-write
+        # update, concurrent requests would drop each other's topics
+        print(f"1. Sending {CONCURRENCY} concurrent score updates...")
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+            list(pool.map(
+                lambda i: put(f"/documents/{document_id}/scores", {"topic_scores": [{f"topic{i}": i % 10}]}),
+                range(CONCURRENCY),
+            ))
+        scores = {}
+        for score_item in requests.get(f"{BASE_URL}/documents/{document_id}").json()["data"]["topic_scores"]:
+            scores.update(score_item)
+        expected = {"existing": 5.0, **{f"topic{i}": i % 10 for i in range(CONCURRENCY)}}
+        if scores == expected:
+            print(f"✅ All {len(expected)} topic scores present")
+        else:
+            failures += 1
+            print(f"❌ Lost score updates: missing {sorted(set(expected) - set(scores))}")
+
+        # Fewer pushes than the window, so every question must survive
+        print(f"\n2. Sending {QUESTION_WINDOW} concurrent question updates...")
+        with ThreadPoolExecutor(max_workers=QUESTION_WINDOW) as pool:
+            list(pool.map(
+                lambda i: put(f"/documents/{document_id}/questions", {"questions": [f"Question {i}?"]}),
+                range(QUESTION_WINDOW),
+            ))
+        questions = requests.get(f"{BASE_URL}/documents/{document_id}").json()["data"]["questions"]
+        if sorted(questions) == sorted(f"Question {i}?" for i in range(QUESTION_WINDOW)):
+            print(f"✅ All {QUESTION_WINDOW} questions present")
+        else:
+            failures += 1
+            print(f"❌ Lost question updates: {questions}")
+
+        # More pushes than the window: exactly the window is kept
+        print(f"\n3. Sending {CONCURRENCY} more concurrent question updates...")
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+            list(pool.map(
+                lambda i: put(f"/documents/{document_id}/questions", {"questions": [f"Extra {i}?"]}),
+                range(CONCURRENCY),
+            ))
+        questions = requests.get(f"{BASE_URL}/documents/{document_id}").json()["data"]["questions"]
+        if len(questions) == QUESTION_WINDOW and all(q.startswith("Extra ") for q in questions):
+            print(f"✅ Question window holds the last {QUESTION_WINDOW} questions")
+        else:
+            failures += 1
+            print(f"❌ Unexpected question window: {questions}")
+    finally:
+        requests.delete(f"{BASE_URL}/documents/{document_id}")
+
+    print("\n🎉 No lost updates!" if failures == 0 else f"\n💥 {failures} check(s) failed")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    test_concurrent_updates()
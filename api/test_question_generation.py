@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Quiz generation test against the fake OpenAI server's canned replies
+Runs in-process; no API server, MongoDB or OpenAI key needed
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "benchmarks"))
+
+import llm  # noqa: E402
+import quiz  # noqa: E402
+from fake_openai import _reply_for  # noqa: E402
+
+TEXT = "Photosynthesis converts light into chemical energy. Cells divide by mitosis. " * 50
+TOPICS = ["Photosynthesis", "Cell Biology", "Genetics"]
+
+
+class FakeClient:
+    """Answers chat completions the way benchmarks/fake_openai.py does"""
+
+    def __init__(self):
+        self.completions = 0
+
+    async def chat(self, prompt, temperature=0.7, timeout=None):
+        self.completions += 1
+        return _reply_for(prompt)
+
+
+async def generate(num_questions):
+    questions = [q async for q in quiz.iter_questions(TEXT, TOPICS, num_questions)]
+    return questions
+
+
+def test_iter_questions_fills_quiz():
+    print("🧪 Testing that distinct replies fill a quiz without refills\n")
+    failures = 0
+    llm.client = FakeClient()
+    try:
+        for num_questions in (1, 5, 10, 25):
+            before = llm.client.completions
+            questions = asyncio.run(generate(num_questions))
+            completions = llm.client.completions - before
+            expected = len(quiz._plan_completions(quiz.allocate_topics(TOPICS, num_questions)))
+            if len(questions) == num_questions and completions == expected:
+                print(f"✅ {num_questions} questions from {completions} completions")
+            else:
+                failures += 1
+                print(f"❌ {len(questions)}/{num_questions} questions from {completions} completions (expected {expected})")
+    finally:
+        llm.client = None
+
+    print("\n🎉 Quizzes filled!" if failures == 0 else f"\n💥 {failures} check(s) failed")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if test_iter_questions_fills_quiz() else 1)
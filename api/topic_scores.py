@@ -0,0 +1,271 @@
+"""Storage format for topic scores and its compatibility layer.
+
+Scores are stored on users and documents as a map keyed by topic:
+
+    "scores": {"<topic key>": {"score": 8.5, "n": 3, "updated_at": ...}}
+
+so a single topic can be updated (or $inc'd) in place. The API keeps the
+original shape, a list of single-topic dicts in "topic_scores", and
+to_api() converts on the way out. Records written before the map existed
+keep a legacy "topic_scores" list until migrate() folds it into "scores".
+
+A user's entries also carry a mastery rollup, updated by each quiz result
+in the same write as the score (see apply_steps_pipeline):
+
+    {"quizzes": 4, "answered": 12, "correct": 9, "quiz_average": 3.5,
+     "last_quiz_score": 4.0, "last_seen": ...}
+
+so the dashboard reads one user record (mastery_to_api()) rather than
+aggregating over every document.
+"""
+
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List
+
+from pymongo import UpdateOne
+
+import db
+import migrations
+
+logger = logging.getLogger(__name__)
+
+# Fold legacy topic_scores lists into the scores map in the background at startup
+TOPIC_SCORES_MIGRATE = os.getenv('TOPIC_SCORES_MIGRATE', 'true').lower() in ('1', 'true', 'yes')
+# Score change per quiz answer, and the range scores are kept within
+QUIZ_SCORE_STEP = 0.5
+MIN_SCORE = 0.0
+MAX_SCORE = 10.0
+# Records migrated per bulk write
+MIGRATION_BATCH_SIZE = int(os.getenv('TOPIC_SCORES_MIGRATION_BATCH_SIZE', '500'))
+
+
+def encode_topic(topic: str) -> str:
+    """Field name for a topic; '.' and '$' would otherwise be read as path or operator syntax"""
+    return topic.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def decode_topic(key: str) -> str:
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+
+def to_dict(topic_scores: List[Dict[str, float]]) -> Dict[str, float]:
+    """Flatten the API's list of single-topic dicts into {topic: score}"""
+    scores = {}
+    for score_item in topic_scores or []:
+        scores.update(score_item)
+    return scores
+
+
+def to_list(scores: Dict[str, float]) -> List[Dict[str, float]]:
+    return [{topic: score} for topic, score in scores.items()]
+
+
+def to_map(topic_scores: List[Dict[str, float]], now: datetime) -> Dict[str, Dict]:
+    """Stored scores map for an API topic_scores list"""
+    return {
+        encode_topic(topic): {"score": score, "n": 1, "updated_at": now}
+        for topic, score in to_dict(topic_scores).items()
+    }
+
+
+def to_api(record: Dict) -> Dict:
+    """Replace a stored record's scores map with the API's topic_scores list, in place.
+
+    Legacy topic_scores entries not yet migrated are kept, with the map taking
+    precedence for topics present in both.
+    """
+    if "scores" not in record:
+        return record
+    merged = to_dict(record.get("topic_scores", []))
+    for key, entry in record.pop("scores").items():
+        merged[decode_topic(key)] = entry["score"]
+    record["topic_scores"] = to_list(merged)
+    return record
+
+
+def merge_update(topic_scores: List[Dict[str, float]], now: datetime) -> Dict:
+    """Update operators that set the given topics' scores, leaving other topics alone"""
+    update = {"$set": {}, "$inc": {}}
+    for topic, score in to_dict(topic_scores).items():
+        key = encode_topic(topic)
+        update["$set"][f"scores.{key}.score"] = score
+        update["$set"][f"scores.{key}.updated_at"] = now
+        update["$inc"][f"scores.{key}.n"] = 1
+    return {operator: fields for operator, fields in update.items() if fields}
+
+
+def replace_pipeline(topic_scores: List[Dict[str, float]], now: datetime) -> List[Dict]:
+    """Update pipeline that replaces all of a record's scores, keeping the update count of retained topics"""
+    # Retained topics keep their mastery rollup
+    replacement = {
+        key: {"$mergeObjects": [
+            {"$ifNull": [f"$scores.{key}", {}]},
+            {
+                "score": {"$literal": score},
+                "n": {"$add": [{"$ifNull": [f"$scores.{key}.n", 0]}, 1]},
+                "updated_at": {"$literal": now},
+            },
+        ]}
+        for key, score in ((encode_topic(topic), score) for topic, score in to_dict(topic_scores).items())
+    }
+    # Setting "scores" directly would merge into the existing map, so build
+    # the new map in a temporary field and then swap it in
+    return [
+        {"$set": {"_new_scores": replacement or {"$literal": {}}}},
+        {"$set": {"scores": "$_new_scores"}},
+        {"$unset": ["_new_scores", "topic_scores"]},
+    ]
+
+
+def quiz_steps(results) -> Dict[str, List[float]]:
+    """Per-topic score changes for a quiz's answers, in answer order.
+
+    Every topic in the quiz is included; unanswered questions add no step.
+    """
+    steps = {}
+    for result in results:
+        topic_steps = steps.setdefault(result.topic, [])
+        if result.correct is not None:
+            topic_steps.append(QUIZ_SCORE_STEP if result.correct else -QUIZ_SCORE_STEP)
+    return steps
+
+
+def fold(steps: List[float], start: float = 0.0) -> float:
+    """Apply score changes one at a time, keeping the score within MIN_SCORE..MAX_SCORE"""
+    score = start
+    for step in steps:
+        score = max(MIN_SCORE, min(MAX_SCORE, score + step))
+    return score
+
+
+def _legacy_score(topic: str) -> Dict:
+    """Expression for the topic's score in a legacy topic_scores list not yet migrated (missing if absent)"""
+    pairs = {"$reduce": {
+        "input": {"$ifNull": ["$topic_scores", []]},
+        "initialValue": [],
+        "in": {"$concatArrays": ["$$value", {"$objectToArray": "$$this"}]},
+    }}
+    matches = {"$filter": {"input": pairs, "as": "pair", "cond": {"$eq": ["$$pair.k", {"$literal": topic}]}}}
+    # The last entry wins, as in to_dict
+    return {"$let": {"vars": {"match": {"$arrayElemAt": [matches, -1]}}, "in": "$$match.v"}}
+
+
+def _mastery_fields(key: str, topic_steps: List[float], now: datetime) -> Dict:
+    """Expressions that add one quiz's answers on a topic to its mastery rollup"""
+    quizzes = {"$add": [{"$ifNull": [f"$scores.{key}.quizzes", 0]}, 1]}
+    average = {"$ifNull": [f"$scores.{key}.quiz_average", 0]}
+    # The quiz's own score for the topic, as recorded on the document
+    quiz_score = fold(topic_steps)
+    return {
+        "quizzes": quizzes,
+        "answered": {"$add": [{"$ifNull": [f"$scores.{key}.answered", 0]}, len(topic_steps)]},
+        "correct": {"$add": [
+            {"$ifNull": [f"$scores.{key}.correct", 0]}, sum(1 for step in topic_steps if step > 0),
+        ]},
+        # Running mean, so no per-quiz history needs to be kept
+        "quiz_average": {"$add": [average, {"$divide": [{"$subtract": [quiz_score, average]}, quizzes]}]},
+        "last_quiz_score": {"$literal": quiz_score},
+        "last_seen": {"$literal": now},
+    }
+
+
+def apply_steps_pipeline(steps: Dict[str, List[float]], now: datetime) -> List[Dict]:
+    """Update pipeline that folds score changes into a record's stored scores on the server (see fold).
+
+    Topics with answered questions also have the quiz added to their mastery rollup.
+    A topic only in a legacy topic_scores list starts from its score there,
+    so quizzes taken before the record is migrated don't reset it.
+    """
+    updates = {}
+    for topic, topic_steps in steps.items():
+        key = encode_topic(topic)
+        updates[f"scores.{key}"] = {
+            "score": {"$reduce": {
+                "input": {"$literal": topic_steps},
+                "initialValue": {"$ifNull": [f"$scores.{key}.score", {"$ifNull": [_legacy_score(topic), 0]}]},
+                "in": {"$min": [MAX_SCORE, {"$max": [MIN_SCORE, {"$add": ["$$value", "$$this"]}]}]},
+            }},
+            "n": {"$add": [{"$ifNull": [f"$scores.{key}.n", 0]}, 1]},
+            "updated_at": {"$literal": now},
+        }
+        if topic_steps:
+            updates[f"scores.{key}"].update(_mastery_fields(key, topic_steps, now))
+    return [{"$set": updates}]
+
+
+def mastery_to_api(record: Dict) -> List[Dict]:
+    """A user's per-topic mastery, most recently quizzed first.
+
+    Topics not quizzed since the rollup was added (including legacy entries
+    not yet migrated) have zero counts and no quiz_average or last_seen.
+    """
+    entries = {topic: {"score": score} for topic, score in to_dict(record.get("topic_scores", [])).items()}
+    for key, entry in (record.get("scores") or {}).items():
+        entries[decode_topic(key)] = entry
+    topics = []
+    for topic, entry in entries.items():
+        answered = entry.get("answered", 0)
+        correct = entry.get("correct", 0)
+        topics.append({
+            "topic": topic,
+            "score": entry["score"],
+            "quizzes": entry.get("quizzes", 0),
+            "answered": answered,
+            "correct": correct,
+            "accuracy": correct / answered if answered else None,
+            "quiz_average": entry.get("quiz_average"),
+            "last_quiz_score": entry.get("last_quiz_score"),
+            "last_seen": entry.get("last_seen"),
+        })
+    topics.sort(key=lambda topic: topic["last_seen"] or datetime.min, reverse=True)
+    return topics
+
+
+def count_expression() -> Dict:
+    """Aggregation expression for the number of topics a record has scores for"""
+    return {"$cond": [
+        {"$eq": [{"$type": "$scores"}, "object"]},
+        {"$size": {"$objectToArray": "$scores"}},
+        {"$size": {"$ifNull": ["$topic_scores", []]}},
+    ]}
+
+
+async def migrate(collection) -> int:
+    """Move legacy topic_scores lists into the scores map; safe to run while serving traffic.
+
+    Each record is rewritten only if its legacy list is unchanged since it
+    was read, and topics already in the map (written since) are left as they are.
+    """
+    migrated = 0
+    batch = []
+    now = datetime.utcnow()
+    async for record in collection.find({"topic_scores": {"$exists": True}}, {"topic_scores": 1, "scores": 1}):
+        current = record.get("scores") or {}
+        update = {"$unset": {"topic_scores": ""}}
+        legacy = {key: entry for key, entry in to_map(record["topic_scores"], now).items() if key not in current}
+        if legacy:
+            update["$set"] = {f"scores.{key}": entry for key, entry in legacy.items()}
+        elif "scores" not in record:
+            update["$set"] = {"scores": {}}
+        batch.append(UpdateOne({"_id": record["_id"], "topic_scores": record["topic_scores"]}, update))
+        if len(batch) >= MIGRATION_BATCH_SIZE:
+            migrated += (await collection.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        migrated += (await collection.bulk_write(batch, ordered=False)).modified_count
+    return migrated
+
+
+async def migrate_all():
+    for name, collection in (("users", db.users_collection()), ("documents", db.documents_collection())):
+        try:
+            migrated = await migrate(collection)
+            if migrated:
+                logger.info(f"Migrated topic scores of {migrated} {name} to the keyed format")
+        except Exception as e:
+            logger.error(f"Topic score migration failed for {name}: {e}")
+
+
+migration = migrations.BackgroundMigration("Topic score", migrate_all, enabled=TOPIC_SCORES_MIGRATE)
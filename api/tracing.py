@@ -0,0 +1,62 @@
+"""Optional per-request trace spans, exported over OTLP/HTTP to a local collector.
+
+Off unless TRACE_EXPORT_ENDPOINT is set and the OpenTelemetry SDK and OTLP
+exporter are installed (opentelemetry-sdk, opentelemetry-exporter-otlp-proto-http).
+Each request gets a span, with a child span per OpenAI completion; span()
+is a no-op otherwise, so call sites don't need to check.
+"""
+
+import logging
+import os
+from contextlib import contextmanager
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+except ImportError:
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+# OTLP/HTTP traces endpoint, e.g. http://localhost:4318/v1/traces (Jaeger, an OpenTelemetry Collector, ...)
+TRACE_EXPORT_ENDPOINT = os.getenv('TRACE_EXPORT_ENDPOINT')
+TRACE_SERVICE_NAME = os.getenv('TRACE_SERVICE_NAME', 'quiz-api')
+
+_provider = None
+_tracer = None
+
+
+def start():
+    """Start exporting spans if an endpoint is configured"""
+    global _provider, _tracer
+    if not TRACE_EXPORT_ENDPOINT or _tracer is not None:
+        return
+    if trace is None:
+        logger.warning("TRACE_EXPORT_ENDPOINT is set but OpenTelemetry is not installed; tracing disabled")
+        return
+    _provider = TracerProvider(resource=Resource.create({"service.name": TRACE_SERVICE_NAME}))
+    _provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=TRACE_EXPORT_ENDPOINT)))
+    _tracer = _provider.get_tracer(__name__)
+    logger.info(f"Exporting trace spans to {TRACE_EXPORT_ENDPOINT}")
+
+
+def stop():
+    """Flush pending spans and stop exporting"""
+    global _provider, _tracer
+    if _provider is not None:
+        _provider.shutdown()
+    _provider = None
+    _tracer = None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Span around the block, nested under the current one; yields None when tracing is off"""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
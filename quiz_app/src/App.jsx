@@ -7,7 +7,7 @@ import { Login } from "./pages/Login";
 import { SignUp } from "./pages/SignUp";
 import { BrowserRouter, Routes, Route, Navigate } from "react-router-dom";
 import "./App.css";
-import { generateQuiz } from "./utils/ai";
+import { streamQuiz } from "./utils/ai";
 import { Loading } from "./components/Loading";
 import { Navbar } from "./components/Navbar";
 import { Dashboard } from "./pages/Dashboard";
@@ -19,6 +19,7 @@ import {
   convertTopicScoresToObject,
   updateMultipleTopicScores,
   updateDocumentQuestions,
+  getDocumentQuiz,
 } from "./utils/api";
 import { ResultsPage } from "./pages/ResultsPage";
 
@@ -26,6 +27,7 @@ function App() {
   const [loading, setLoading] = useState(false);
   const [textContent, setTextContent] = useState("");
   const [questions, setQuestions] = useState([]);
+  const [quizStreaming, setQuizStreaming] = useState(false);
   const [userScores, setUserScores] = useState({});
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [activeUser, setActiveUser] = useState(null);
@@ -138,26 +140,69 @@ function App() {
         previousQuestionsCount: previousQuestions.length
       });
       
-      // Generate questions using AI
-      const questions = await generateQuiz(
-        textContent,
-        selectedTopics,
-        previousQuestions,
-        numQuestions
-      );
-      
-      // Add questions to database
-      if (questions.length > 0) {
-        const questionsList = questions.map(q => q.question);
-        await updateDocumentQuestions(documentId, questionsList);
-        console.log("Successfully generated and saved", questions.length, "questions");
+      // Serve what we can from the document's pre-generated question pool
+      let pooled = [];
+      try {
+        const response = await getDocumentQuiz(
+          documentId,
+          selectedTopics,
+          numQuestions,
+          previousQuestions,
+          false
+        );
+        pooled = response.data.questions;
+      } catch (error) {
+        console.error("Error loading pooled questions:", error);
       }
-      
-      setQuestions(questions);
+
+      // Stream the rest from the server so the quiz can start as soon as
+      // the first one arrives; they are appended in the background
+      const streamed = [...pooled];
+      let resolveFirst;
+      const firstQuestion = new Promise((resolve) => {
+        resolveFirst = resolve;
+      });
+      if (pooled.length > 0) {
+        setQuestions([...streamed]);
+        resolveFirst();
+      }
+      setQuizStreaming(pooled.length < numQuestions);
+      const remaining =
+        pooled.length < numQuestions
+          ? streamQuiz(
+              documentId,
+              selectedTopics,
+              [...previousQuestions, ...pooled.map((q) => q.question)],
+              numQuestions - pooled.length,
+              (question) => {
+                streamed.push(question);
+                setQuestions([...streamed]);
+                resolveFirst();
+              }
+            )
+          : Promise.resolve([]);
+      const allQuestions = remaining.then(async () => {
+        const questions = streamed;
+        setQuizStreaming(false);
+        // Add questions to database
+        if (questions.length > 0) {
+          try {
+            const questionsList = questions.map(q => q.question);
+            await updateDocumentQuestions(documentId, questionsList);
+            console.log("Successfully generated and saved", questions.length, "questions");
+          } catch (error) {
+            console.error("Error saving generated questions:", error);
+          }
+        }
+        return questions;
+      });
+
+      await Promise.race([firstQuestion, allQuestions]);
       setLoading(false);
-      return questions;
+      return [...streamed];
     } catch (error) {
       console.error("Error generating quiz:", error);
+      setQuizStreaming(false);
       setLoading(false);
       return [];
     }
@@ -244,8 +289,9 @@ function App() {
               <ProtectedRoute>
                 <QuizPage
                   questions={questions}
+                  quizStreaming={quizStreaming}
                   userScores={userScores}
-                  setUserScores={updateUserScoresInDB}
+                  setUserScores={setUserScores}
                   activeUser={activeUser}
                 />
               </ProtectedRoute>
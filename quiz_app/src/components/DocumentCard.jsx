@@ -39,7 +39,7 @@ export const DocumentCard = ({ doc, navigate, handleDeleteDocument }) => {
       </div>
       
       <p className="text-xs sm:text-sm text-gray-600 mb-2 sm:mb-3 line-clamp-2 leading-relaxed">
-        {doc.document_content.substring(0, 80)}...
+        {(doc.preview ?? doc.document_content ?? "").substring(0, 80)}...
       </p>
       
       <div className="flex justify-between items-center text-xs sm:text-sm text-gray-500 mb-1 sm:mb-2">
@@ -49,7 +49,7 @@ export const DocumentCard = ({ doc, navigate, handleDeleteDocument }) => {
         </span>
         <span className="flex items-center gap-1">
           <span className="w-2 h-2 bg-green-400 rounded-full"></span>
-          {doc.questions?.length || 0} questions
+          {doc.question_count ?? doc.questions?.length ?? 0} questions
         </span>
       </div>
       
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
-import { getDocuments } from "../utils/api";
+import { getDocuments, getUserMastery } from "../utils/api";
 import { Loading } from "../components/Loading";
 import { DocumentCard } from "../components/DocumentCard";
 import { deleteDocument } from "../utils/api";
@@ -9,11 +9,37 @@ export const Dashboard = ({ topicScores, activeUser }) => {
   const navigate = useNavigate();
   const [documents, setDocuments] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [mastery, setMastery] = useState([]);
 
   useEffect(() => {
     loadDocuments();
+    loadMastery();
   }, [activeUser]);
 
+  // Per-topic rollup kept by the server; one request however many documents there are
+  const loadMastery = async () => {
+    if (!activeUser) {
+      setMastery([]);
+      return;
+    }
+    try {
+      const response = await getUserMastery(activeUser);
+      setMastery(response.data?.topics || []);
+    } catch (error) {
+      console.error("Error loading topic mastery:", error);
+      setMastery([]);
+    }
+  };
+
+  const masteryScores = Object.fromEntries(
+    mastery.map((entry) => [entry.topic, entry.score])
+  );
+  const masteryByTopic = Object.fromEntries(
+    mastery.map((entry) => [entry.topic, entry])
+  );
+
   const handleDeleteDocument = async (documentId) => {
     try {
       await deleteDocument(documentId);
@@ -27,14 +53,29 @@ export const Dashboard = ({ topicScores, activeUser }) => {
       setLoading(true);
       const response = await getDocuments(activeUser);
       setDocuments(response.data || []);
+      setNextCursor(response.next_cursor || null);
     } catch (error) {
       console.error("Error loading documents:", error);
       setDocuments([]);
+      setNextCursor(null);
     } finally {
       setLoading(false);
     }
   };
 
+  const loadMoreDocuments = async () => {
+    try {
+      setLoadingMore(true);
+      const response = await getDocuments(activeUser, nextCursor);
+      setDocuments((current) => [...current, ...(response.data || [])]);
+      setNextCursor(response.next_cursor || null);
+    } catch (error) {
+      console.error("Error loading more documents:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getTopicColor = (score) => {
     if (score >= 7) return { bg: "bg-green-500", text: "text-green-600" };
     if (score >= 5) return { bg: "bg-yellow-500", text: "text-yellow-600" };
@@ -75,17 +116,31 @@ export const Dashboard = ({ topicScores, activeUser }) => {
                 </div>
 
                 {documents.length > 0 ? (
-                  <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-4 sm:gap-6">
-                    {documents.map((doc) => (
-                      <DocumentCard
-                        key={doc.id}
-                        doc={doc}
-                        navigate={navigate}
-                        topicScores={topicScores}
-                        handleDeleteDocument={handleDeleteDocument}
-                      />
-                    ))}
-                  </div>
+                  <>
+                    <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-4 sm:gap-6">
+                      {documents.map((doc) => (
+                        <DocumentCard
+                          key={doc._id}
+                          doc={doc}
+                          navigate={navigate}
+                          topicScores={topicScores}
+                          handleDeleteDocument={handleDeleteDocument}
+                        />
+                      ))}
+                    </div>
+                    {nextCursor && (
+                      <div className="text-center mt-4 sm:mt-6">
+                        <button
+                          onClick={loadMoreDocuments}
+                          disabled={loadingMore}
+                          className="bg-gray-100 hover:bg-gray-200 disabled:opacity-50 text-gray-700 px-4 py-2 rounded-lg font-medium transition-colors text-sm"
+                          type="button"
+                        >
+                          {loadingMore ? "Loading..." : "Load More"}
+                        </button>
+                      </div>
+                    )}
+                  </>
                 ) : (
                   <div className="text-center py-8 sm:py-12">
                     <div className="text-3xl sm:text-4xl mb-3 sm:mb-4">📄</div>
@@ -107,13 +162,13 @@ export const Dashboard = ({ topicScores, activeUser }) => {
               </div>
 
               {/* Topic Mastery Section */}
-              {Object.keys(topicScores).length > 0 && (
+              {Object.keys(masteryScores).length > 0 && (
                 <div className="mb-6 sm:mb-8">
                   <h2 className="text-xl sm:text-2xl font-semibold text-gray-800 border-b-2 border-gray-200 pb-2 mb-4 sm:mb-6">
                     Topic Mastery Overview
                   </h2>
                   <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-4 sm:gap-6">
-                    {Object.entries(topicScores).map(([topic, score]) => {
+                    {Object.entries(masteryScores).map(([topic, score]) => {
                       const colors = getTopicColor(score);
                       const percentage = (score / 10) * 100;
 
@@ -160,6 +215,16 @@ export const Dashboard = ({ topicScores, activeUser }) => {
 
                           <div className="mt-2 sm:mt-3 text-xs text-gray-500">
                             Progress: {percentage.toFixed(0)}%
+                            {masteryByTopic[topic]?.quizzes > 0 && (
+                              <>
+                                {" · "}
+                                {masteryByTopic[topic].quizzes} quizzes
+                                {masteryByTopic[topic].accuracy !== null &&
+                                  ` · ${Math.round(
+                                    masteryByTopic[topic].accuracy * 100
+                                  )}% correct`}
+                              </>
+                            )}
                           </div>
                         </div>
                       );
@@ -174,7 +239,7 @@ export const Dashboard = ({ topicScores, activeUser }) => {
                     <div className="grid grid-cols-2 lg:grid-cols-4 gap-3 sm:gap-4 text-center">
                       <div className="bg-white rounded-lg p-3 sm:p-4 shadow-sm">
                         <div className="text-xl sm:text-2xl font-bold text-blue-600">
-                          {Object.keys(topicScores).length}
+                          {Object.keys(masteryScores).length}
                         </div>
                         <div className="text-xs sm:text-sm text-gray-600">
                           Topics Studied
@@ -183,7 +248,7 @@ export const Dashboard = ({ topicScores, activeUser }) => {
                       <div className="bg-white rounded-lg p-3 sm:p-4 shadow-sm">
                         <div className="text-xl sm:text-2xl font-bold text-green-600">
                           {
-                            Object.values(topicScores).filter(
+                            Object.values(masteryScores).filter(
                               (score) => score >= 7
                             ).length
                           }
@@ -193,7 +258,7 @@ export const Dashboard = ({ topicScores, activeUser }) => {
                       <div className="bg-white rounded-lg p-3 sm:p-4 shadow-sm">
                         <div className="text-xl sm:text-2xl font-bold text-yellow-600">
                           {
-                            Object.values(topicScores).filter(
+                            Object.values(masteryScores).filter(
                               (score) => score >= 5 && score < 7
                             ).length
                           }
@@ -203,10 +268,10 @@ export const Dashboard = ({ topicScores, activeUser }) => {
                       <div className="bg-white rounded-lg p-3 sm:p-4 shadow-sm">
                         <div className="text-xl sm:text-2xl font-bold text-gray-600">
                           {(
-                            Object.values(topicScores).reduce(
+                            Object.values(masteryScores).reduce(
                               (sum, score) => sum + score,
                               0
-                            ) / Object.keys(topicScores).length
+                            ) / Object.keys(masteryScores).length
                           ).toFixed(1)}
                         </div>
                         <div className="text-xs sm:text-sm text-gray-600">Average Score</div>
@@ -2,7 +2,7 @@ import React, { useState } from "react";
 import { useNavigate } from "react-router-dom";
 import { FileUpload } from "../components/FileUpload";
 import { Loading } from "../components/Loading";
-import { parseFile } from "../utils/api";
+import { submitIngestJob, waitForIngestJob } from "../utils/api";
 import { getTopicsFromText } from "../utils/ai";
 
 export const FileParser = ({ userScores, textContent, setTextContent }) => {
@@ -10,6 +10,8 @@ export const FileParser = ({ userScores, textContent, setTextContent }) => {
   const [loading, setLoading] = useState(false);
   const [selectedFile, setSelectedFile] = useState(null);
   const [localTextContent, setLocalTextContent] = useState(textContent);
+  // Topics and title the server worked out alongside parsing the file
+  const [ingested, setIngested] = useState(null);
 
   const handleExtractTopics = async () => {
     try {
@@ -30,9 +32,17 @@ export const FileParser = ({ userScores, textContent, setTextContent }) => {
   const handleFileSelect = async (file) => {
     setSelectedFile(file);
     setLoading(true);
+    setIngested(null);
     if (file) {
-      const parsedContent = await parseFile(file);
-      setLocalTextContent(parsedContent);
+      try {
+        const job = await submitIngestJob(file, Object.keys(userScores));
+        const result = await waitForIngestJob(job.job_id);
+        setLocalTextContent(result.text_content);
+        setIngested(result);
+      } catch (error) {
+        console.error("Error ingesting file:", error);
+        setLocalTextContent("Error parsing file");
+      }
     } else {
       setLocalTextContent("");
     }
@@ -43,13 +53,17 @@ export const FileParser = ({ userScores, textContent, setTextContent }) => {
     try {
       setLoading(true);
       setTextContent(localTextContent);
-      // Extract topics from the text content
-      const topics = await handleExtractTopics(localTextContent);
+      // Reuse the upload's topics and title unless the text was edited since
+      const fromUpload = ingested && ingested.text_content === localTextContent;
+      const topics = fromUpload
+        ? ingested.topics
+        : await handleExtractTopics(localTextContent);
       navigate("/topic-selection", {
         state: {
           extractedTopics: topics || [],
           textContent: localTextContent,
           selectedFile: selectedFile,
+          suggestedName: fromUpload ? ingested.title : "",
         },
       });
       setLoading(false);
@@ -1,22 +1,39 @@
-import React, { useState } from "react";
+import React, { useState, useEffect } from "react";
 import { useLocation, useNavigate } from "react-router-dom";
-import { updateDocumentQuestions, updateDocumentScores } from "../utils/api";
+import {
+  convertTopicScoresToObject,
+  submitQuizResults,
+  updateMultipleTopicScores,
+} from "../utils/api";
 
 export const QuizPage = ({
   questions: questionsProp,
+  quizStreaming = false,
   userScores,
   setUserScores,
+  activeUser,
 }) => {
   const location = useLocation();
   const navigate = useNavigate();
   const { documentId } = location.state || {};
 
   // Use a local copy of questions to prevent reset on parent re-render
-  const [localQuestions] = useState(() => questionsProp);
+  const [localQuestions, setLocalQuestions] = useState(() => questionsProp);
   const [currentQuestionIndex, setCurrentQuestionIndex] = useState(0);
   const [userAnswers, setUserAnswers] = useState({});
   const [selectedOption, setSelectedOption] = useState("");
 
+  // Questions are streamed in, so pick up new ones appended to this quiz
+  useEffect(() => {
+    if (
+      questionsProp.length > localQuestions.length &&
+      localQuestions.length > 0 &&
+      questionsProp[0] === localQuestions[0]
+    ) {
+      setLocalQuestions(questionsProp);
+    }
+  }, [questionsProp, localQuestions]);
+
   if (!localQuestions || localQuestions.length === 0) {
     return (
       <div className="flex flex-col items-center justify-center min-h-screen p-4">
@@ -31,7 +48,10 @@ export const QuizPage = ({
   }
 
   const currentQuestion = localQuestions[currentQuestionIndex];
-  const isLastQuestion = currentQuestionIndex === localQuestions.length - 1;
+  const isLastQuestion =
+    currentQuestionIndex === localQuestions.length - 1 && !quizStreaming;
+  const waitingForQuestion =
+    currentQuestionIndex === localQuestions.length - 1 && quizStreaming;
 
   const handleOptionSelect = (option) => {
     setSelectedOption(option);
@@ -91,63 +111,54 @@ export const QuizPage = ({
     return topicScores;
   };
 
-  const getCurrentTopicScores = (answers = userAnswers) => {
-    const currentScores = {};
+  // When quiz is finished, update scores and navigate to results
+  const handleFinishQuiz = async (finalAnswers = null) => {
+    // Use the provided answers or fall back to state
+    const answersToUse = finalAnswers || userAnswers;
+    
+    // Show the updated user scores straight away
+    const updatedScores = { ...userScores };
     localQuestions.forEach((question, index) => {
       const topic = question.topic || "Unknown Topic";
-      if (!currentScores[topic]) {
-        currentScores[topic] = 0;
+      if (!updatedScores[topic]) {
+        updatedScores[topic] = 0;
       }
-      if (answers[index] !== undefined) {
-        const isCorrect = answers[index] === question.answer;
-        currentScores[topic] += isCorrect ? 0.5 : -0.5;
-        currentScores[topic] = Math.max(0, Math.min(10, currentScores[topic]));
+      if (answersToUse[index] !== undefined) {
+        let scoreChange = answersToUse[index] === question.answer ? 0.5 : -0.5;
+        updatedScores[topic] += scoreChange;
+        updatedScores[topic] = Math.max(
+          0,
+          Math.min(10, updatedScores[topic])
+        );
       }
     });
-    return currentScores;
-  };
+    setUserScores?.(updatedScores);
 
-  // When quiz is finished, update scores and navigate to results
-  const handleFinishQuiz = async (finalAnswers = null) => {
-    // Use the provided answers or fall back to state
-    const answersToUse = finalAnswers || userAnswers;
-    
-    // Update user scores
-    if (userScores && setUserScores) {
-      const updatedScores = { ...userScores };
-      localQuestions.forEach((question, index) => {
-        const topic = question.topic || "Unknown Topic";
-        if (!updatedScores[topic]) {
-          updatedScores[topic] = 0;
-        }
-        if (answersToUse[index] !== undefined) {
-          let scoreChange = answersToUse[index] === question.answer ? 0.5 : -0.5;
-          updatedScores[topic] += scoreChange;
-          updatedScores[topic] = Math.max(
-            0,
-            Math.min(10, updatedScores[topic])
+    if (documentId && localQuestions.length > 0) {
+      // Save questions, document scores and user scores in one request
+      try {
+        const results = localQuestions.map((question, index) => ({
+          question: question.question,
+          topic: question.topic || "Unknown Topic",
+          correct:
+            answersToUse[index] !== undefined
+              ? answersToUse[index] === question.answer
+              : null,
+        }));
+        const response = await submitQuizResults(documentId, activeUser, results);
+        if (response.data.user) {
+          setUserScores?.(
+            convertTopicScoresToObject(response.data.user.topic_scores)
           );
         }
-      });
-      setUserScores(updatedScores);
-    }
-    // Update document if available
-    if (documentId && localQuestions.length > 0) {
+      } catch (error) {
+        console.error("Error saving quiz results:", error);
+      }
+    } else if (activeUser) {
       try {
-        const questionsList = [];
-        localQuestions.forEach((question) => {
-          questionsList.push(question.question);
-        });
-        await updateDocumentQuestions(documentId, questionsList);
-        const currentScores = getCurrentTopicScores(answersToUse);
-        const documentTopicScores = Object.entries(currentScores).map(
-          ([topic, score]) => ({
-            [topic]: Math.max(0, Math.min(10, score)),
-          })
-        );
-        await updateDocumentScores(documentId, documentTopicScores);
+        await updateMultipleTopicScores(activeUser, updatedScores);
       } catch (error) {
-        console.error("Error updating document:", error);
+        console.error("Error updating scores in database:", error);
       }
     }
     // Navigate to results page with all necessary data
@@ -271,10 +282,14 @@ export const QuizPage = ({
 
             <button
               onClick={handleNext}
-              disabled={!selectedOption}
+              disabled={!selectedOption || waitingForQuestion}
               className="quiz-btn w-full sm:w-auto text-sm sm:text-base py-2 sm:py-3"
             >
-              {isLastQuestion ? "Finish Quiz" : "Next"}
+              {isLastQuestion
+                ? "Finish Quiz"
+                : waitingForQuestion
+                ? "Generating..."
+                : "Next"}
             </button>
           </div>
 
@@ -15,13 +15,14 @@ export const TopicSelectionPage = ({
     extractedTopics = [],
     textContent,
     selectedFile,
+    suggestedName = "",
   } = location.state || {};
 
   const [selectedTopics, setSelectedTopics] = useState([]);
   const [newTopic, setNewTopic] = useState("");
   const [numQuestions, setNumQuestions] = useState(10);
   const [loading, setLoading] = useState(false);
-  const [documentName, setDocumentName] = useState("");
+  const [documentName, setDocumentName] = useState(suggestedName);
   const [generatingName, setGeneratingName] = useState(false);
 
   // Initialize selected topics and generate document name when component mounts
@@ -30,7 +31,7 @@ export const TopicSelectionPage = ({
       setSelectedTopics([...extractedTopics]);
     }
 
-    // Generate document name if we have content
+    // Generate document name if we have content and no name from the upload
     if (textContent && !documentName) {
       generateDocumentNameFromContent();
     }
@@ -43,13 +43,34 @@ const parseTopics = async (topicsResponse) => {
   }
 };
 
-const generateQuizQuestion = async (textContent, topic, previousQuestions) => {
+export const getTopicsFromText = async (textContent, currentTopics = []) => {
+  const topicsResponse = await extractTopics(textContent, currentTopics);
+  const topics = await parseTopics(topicsResponse);
+  return topics;
+};
+
+/**
+ * Generate a full quiz in a single request. The server spreads the questions
+ * across topics, generates them concurrently and removes duplicates.
+ * @param {string} documentId - ID of the stored document to quiz on
+ * @param {Array} topics - Topics to generate questions for
+ * @param {Array} previousQuestions - Questions to avoid repeating
+ * @param {number} numQuestions - Number of questions to generate
+ * @returns {Promise<Array>} - The generated questions
+ */
+export const generateQuiz = async (
+  documentId,
+  topics,
+  previousQuestions,
+  numQuestions
+) => {
   try {
     const response = await axios.post(
-      `${API_BASE_URL}/ai/generate-quiz`,
+      `${API_BASE_URL}/ai/generate-quiz/batch`,
       {
-        text_content: textContent,
-        topic: topic,
+        document_id: documentId,
+        topics: topics.length > 0 ? topics : ["general"],
+        num_questions: numQuestions,
         previous_questions: previousQuestions,
       },
       {
@@ -58,116 +79,87 @@ const generateQuizQuestion = async (textContent, topic, previousQuestions) => {
         },
       }
     );
-    
+
     if (response.data.success) {
-      return JSON.stringify(response.data.data);
+      const questions = response.data.data.questions;
+      console.log(`Generated ${questions.length} unique questions out of ${numQuestions} requested`);
+      return questions;
     } else {
-      throw new Error("Failed to generate quiz question");
+      throw new Error("Failed to generate quiz");
     }
   } catch (error) {
-    console.error("Error generating quiz question:", error);
-    return null;
-  }
-};
-
-const parseQuizQuestion = async (question) => {
-  try {
-    let parsed = question.trim();
-    parsed = parsed.replace(/^```json\n/, "");
-    parsed = parsed.replace(/\n```$/, "");
-    parsed = parsed.replace(/^```/g, "");
-    parsed = parsed.replace(/\n```/g, "");
-    parsed = parsed.replace(/^```/g, "");
-    parsed = JSON.parse(parsed);
-    return parsed;
-  } catch (error) {
-    console.error("Error parsing quiz question:", error);
-    return null;
+    console.error("Error generating quiz:", error);
+    return [];
   }
 };
 
-export const getTopicsFromText = async (textContent, currentTopics = []) => {
-  const topicsResponse = await extractTopics(textContent, currentTopics);
-  const topics = await parseTopics(topicsResponse);
-  return topics;
-};
-
-export const generateQuiz = async (
-  textContent,
+/**
+ * Stream a quiz from the server. Each question is passed to onQuestion as
+ * soon as it has been generated, instead of waiting for the whole set.
+ * @param {string} documentId - ID of the stored document to quiz on
+ * @param {Array} topics - Topics to generate questions for
+ * @param {Array} previousQuestions - Questions to avoid repeating
+ * @param {number} numQuestions - Number of questions to generate
+ * @param {Function} onQuestion - Called with each question as it arrives
+ * @returns {Promise<Array>} - All questions once the stream has finished
+ */
+export const streamQuiz = async (
+  documentId,
   topics,
   previousQuestions,
-  numQuestions
+  numQuestions,
+  onQuestion
 ) => {
   const questions = [];
-  const topicsToUse = topics.length > 0 ? topics : ["general"];
-  
-  // Create a more diverse topic selection pattern
-  const topicSelection = [];
-  for (let i = 0; i < numQuestions; i++) {
-    // Use modulo to cycle through topics, but add some randomness
-    const baseIndex = i % topicsToUse.length;
-    const topic = topicsToUse[baseIndex];
-    topicSelection.push(topic);
-  }
-  
-  // Shuffle the topic selection to add more variety
-  for (let i = topicSelection.length - 1; i > 0; i--) {
-    const j = Math.floor(Math.random() * (i + 1));
-    [topicSelection[i], topicSelection[j]] = [topicSelection[j], topicSelection[i]];
-  }
+  try {
+    const response = await fetch(`${API_BASE_URL}/ai/generate-quiz/stream`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        Accept: "text/event-stream",
+      },
+      body: JSON.stringify({
+        document_id: documentId,
+        topics: topics.length > 0 ? topics : ["general"],
+        num_questions: numQuestions,
+        previous_questions: previousQuestions,
+      }),
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`Failed to stream quiz: ${response.status}`);
+    }
 
-  // Track all questions to detect duplicates
-  const allQuestionTexts = new Set(previousQuestions.map(q => q.toLowerCase().trim()));
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
 
-  for (let i = 0; i < numQuestions; i++) {
-    const topic = topicSelection[i];
-    
-    // Get all previous questions to avoid repetition
-    const allPreviousQuestions = [
-      ...previousQuestions,
-      ...questions.map((q) => q.question)
-    ];
-    
-    let attempts = 0;
-    let parsedQuestion = null;
-    
-    // Try up to 3 times to get a unique question
-    while (attempts < 3 && !parsedQuestion) {
-      const question = await generateQuizQuestion(
-        textContent, 
-        topic, 
-        allPreviousQuestions
-      );
-      
-      parsedQuestion = await parseQuizQuestion(question);
-      
-      if (parsedQuestion) {
-        const questionText = parsedQuestion.question.toLowerCase().trim();
-        
-        // Check if this question is a duplicate
-        if (allQuestionTexts.has(questionText)) {
-          console.warn(`Duplicate question detected: "${parsedQuestion.question}"`);
-          parsedQuestion = null;
-          attempts++;
-        } else {
-          allQuestionTexts.add(questionText);
-          break;
+      // Server-Sent Events are separated by a blank line
+      let boundary;
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        let event = "message";
+        let data = "";
+        rawEvent.split("\n").forEach((line) => {
+          if (line.startsWith("event: ")) event = line.slice(7);
+          else if (line.startsWith("data: ")) data += line.slice(6);
+        });
+        if (event === "question") {
+          const question = JSON.parse(data);
+          questions.push(question);
+          onQuestion?.(question);
+        } else if (event === "error") {
+          console.error("Error streaming quiz:", JSON.parse(data).detail);
         }
-      } else {
-        attempts++;
       }
     }
-    
-    if (parsedQuestion) {
-      // Ensure the topic is included in the question object
-      parsedQuestion.topic = topic;
-      questions.push(parsedQuestion);
-    } else {
-      console.error(`Failed to generate unique question for topic: ${topic} after ${attempts} attempts`);
-      // Continue with next question instead of retrying indefinitely
-    }
+  } catch (error) {
+    console.error("Error streaming quiz:", error);
   }
-  
   console.log(`Generated ${questions.length} unique questions out of ${numQuestions} requested`);
   return questions;
 };
@@ -28,6 +28,53 @@ export const parseFile = async (file) => {
   }
 };
 
+/**
+ * Queue a file for parsing, topic extraction and naming on the server
+ * @param {File} file - The file to ingest
+ * @param {Array} currentTopics - Existing topics to keep if relevant
+ * @returns {Promise<Object>} - The queued job, with its job_id
+ */
+export const submitIngestJob = async (file, currentTopics = []) => {
+  const formData = new FormData();
+  formData.append("file", file);
+  currentTopics.forEach((topic) => formData.append("current_topics", topic));
+  const response = await axios.post(`${API_BASE_URL}/ingest/jobs`, formData, {
+    headers: {
+      "Content-Type": "multipart/form-data",
+    },
+  });
+  return response.data.data;
+};
+
+/**
+ * Poll an ingestion job until it finishes
+ * @param {string} jobId - The job ID returned by submitIngestJob
+ * @param {number} intervalMs - Delay between polls
+ * @param {number} timeoutMs - Time to wait before giving up, e.g. when no worker is running
+ * @returns {Promise<Object>} - The finished job: text_content, topics and title
+ */
+export const waitForIngestJob = async (
+  jobId,
+  intervalMs = 500,
+  timeoutMs = 5 * 60 * 1000
+) => {
+  const deadline = Date.now() + timeoutMs;
+  for (;;) {
+    const response = await axios.get(`${API_BASE_URL}/ingest/jobs/${jobId}`);
+    const job = response.data.data;
+    if (job.status === "done") {
+      return job;
+    }
+    if (job.status === "failed") {
+      throw new Error(job.error || "Ingestion failed");
+    }
+    if (Date.now() >= deadline) {
+      throw new Error(`Ingestion job ${jobId} did not finish in time`);
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+};
+
 /**
  * Create a new user with optional topic scores
  * @param {string} userId - The unique identifier for the user
@@ -81,6 +128,25 @@ export const getUserScores = async (userId) => {
   }
 };
 
+/**
+ * Get a user's per-topic mastery, maintained by the server on each quiz result
+ * @param {string} userId - The unique identifier for the user
+ * @returns {Promise<Object>} - Response data with one
+ *   {topic, score, quizzes, answered, correct, accuracy, quiz_average, last_quiz_score, last_seen}
+ *   per topic, most recently quizzed first
+ */
+export const getUserMastery = async (userId) => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}/users/${userId}/mastery`);
+    return response.data;
+  } catch (error) {
+    if (error.response?.status === 404) {
+      return { success: true, data: { user_id: userId, topics: [] } };
+    }
+    throw error;
+  }
+};
+
 /**
  * Convert database topic_scores array to object format
  * @param {Array} topicScoresArray - Array of topic score objects from database
@@ -144,16 +210,19 @@ export const createDocument = async (documentData) => {
 };
 
 /**
- * Get all documents, optionally filtered by user_id
+ * Get a page of document summaries, optionally filtered by user_id
  * @param {string} userId - Optional user ID to filter documents
- * @returns {Promise<Object>} - Documents data
+ * @param {string} cursor - Optional next_cursor from the previous page
+ * @param {number} limit - Optional page size
+ * @returns {Promise<Object>} - Documents data and the next page's cursor
  */
-export const getDocuments = async (userId = null) => {
+export const getDocuments = async (userId = null, cursor = null, limit = null) => {
   try {
-    const url = userId
-      ? `${API_BASE_URL}/documents?user_id=${userId}`
-      : `${API_BASE_URL}/documents`;
-    const response = await axios.get(url);
+    const params = {};
+    if (userId) params.user_id = userId;
+    if (cursor) params.cursor = cursor;
+    if (limit) params.limit = limit;
+    const response = await axios.get(`${API_BASE_URL}/documents`, { params });
     return response.data;
   } catch (error) {
     throw error;
@@ -216,6 +285,60 @@ export const updateDocumentQuestions = async (documentId, questions) => {
   }
 };
 
+/**
+ * Save a finished quiz in one request: the document's questions and scores
+ * and the user's scores are updated together on the server
+ * @param {string} documentId - The document ID
+ * @param {string} userId - The user who took the quiz
+ * @param {Array} results - One {question, topic, correct} per question; correct is null if unanswered
+ * @returns {Promise<Object>} - Response data with the updated document and user
+ */
+export const submitQuizResults = async (documentId, userId, results) => {
+  try {
+    const response = await axios.post(
+      `${API_BASE_URL}/documents/${documentId}/quiz-results`,
+      { user_id: userId, results },
+      { headers: { "Content-Type": "application/json" } }
+    );
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
+
+/**
+ * Get quiz questions from a document's pre-generated question pool
+ * @param {string} documentId - The document ID
+ * @param {Array} topics - Topics to draw questions from
+ * @param {number} numQuestions - Number of questions wanted
+ * @param {Array} previousQuestions - Questions to avoid repeating
+ * @param {boolean} fillMissing - Generate questions the pool can't cover
+ * @returns {Promise<Object>} - Response data with questions and pooled count
+ */
+export const getDocumentQuiz = async (
+  documentId,
+  topics,
+  numQuestions,
+  previousQuestions = [],
+  fillMissing = true
+) => {
+  try {
+    const response = await axios.post(
+      `${API_BASE_URL}/documents/${documentId}/quiz`,
+      {
+        topics: topics,
+        num_questions: numQuestions,
+        previous_questions: previousQuestions,
+        fill_missing: fillMissing,
+      },
+      { headers: { "Content-Type": "application/json" } }
+    );
+    return response.data;
+  } catch (error) {
+    throw error;
+  }
+};
+
 /**
  * Delete a document by ID
  * @param {string} documentId - The document ID